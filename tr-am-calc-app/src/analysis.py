@@ -1,46 +1,194 @@
-from dataclasses import replace
-import pandas as pd
-import plotly.express as px
+import math
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+import numpy as np
+# pandas and plotly are imported where they are used: the model and the surfaces work without them
+if TYPE_CHECKING:
+    import pandas as pd
+from src.event_model import EventModel
+from src.instrument import instrumented
 from src.model import TrofeoAmicizia
+from src.sensitivity import gradient, numeric_fields
 
-def profit_sensitivity(instance, param: str, values) -> pd.DataFrame:
+@dataclass(frozen=True, slots=True)
+class Surface:
     """
-    Clona `instance` variando `field` (nome dell'attributo da cambiare) secondo `values`,
-    un Iterable con i valori da usare
-    e restituisce un DataFrame (comodo per i plot) con x=valore, profit=utile.
+    Dense grid of an output over N parameters, labeled like an xarray DataArray:
+    `values[i, j, …]` is the output at `coords[dims[0]][i]`, `coords[dims[1]][j]`, …
     """
-    records = [
-        {"x": v,
-         "profit": replace(instance, **{param: v}).profit}
-        for v in values
-    ]
-    return pd.DataFrame(records)
+    dims: tuple[str, ...]
+    coords: dict
+    values: np.ndarray
+    name: str = "profit"
+
+    def to_frame(self) -> "pd.DataFrame":
+        """Long format: one column per parameter plus the output."""
+        import pandas as pd
+        index = pd.MultiIndex.from_product([self.coords[d] for d in self.dims], names=self.dims)
+        return pd.DataFrame({self.name: self.values.ravel()}, index=index).reset_index()
+
+@instrumented()
+def profit_surface(instance: EventModel, axes: dict, output: str = "profit") -> Surface:
+    """
+    Valuta `output` (di default l'utile) su tutte le combinazioni dei valori in `axes`
+    (nome campo → valori), es. {"participation_price": prezzi, "participants": iscritti},
+    in un solo passaggio vettoriale.
+    """
+    ndim = len(axes)
+    coords = {name: np.asarray(values) for name, values in axes.items()}
+    grid = {}
+    for axis, (name, values) in enumerate(coords.items()):
+        shape = [1] * ndim
+        shape[axis] = -1
+        grid[name] = values.reshape(shape)
+    batch = type(instance).from_base(instance, **grid)
+    values = getattr(batch, output)
+    values = values() if callable(values) else values
+    return Surface(tuple(coords), coords, np.broadcast_to(values, batch.shape), output)
+
+@instrumented()
+def profit_sensitivity(instance, param: str, values) -> "pd.DataFrame":
+    """
+    Utile di `instance` al variare di `param` (nome del campo) su `values`, un Iterable con
+    i valori da usare: un solo batch vettoriale (`profit_surface` a una dimensione), non un
+    clone per valore. Restituisce un DataFrame (comodo per i plot) con x=valore, profit=utile.
+    """
+    surface = profit_surface(instance, {param: list(values)})
+    import pandas as pd
+    return pd.DataFrame({"x": surface.coords[param], "profit": surface.values})
+
+@instrumented()
+def surface_figure(surface: Surface, kind: str = "heatmap"):
+    """Heatmap (`kind="heatmap"`) o curve di livello (`kind="contour"`) di una superficie 2-D."""
+    if len(surface.dims) != 2:
+        raise ValueError(f"surface_figure needs a 2-D surface, got dims {surface.dims}")
+    y_name, x_name = surface.dims
+    import plotly.graph_objects as go
+    trace = {"heatmap": go.Heatmap, "contour": go.Contour}[kind]
+    fig = go.Figure(trace(
+        x=surface.coords[x_name],
+        y=surface.coords[y_name],
+        z=surface.values,
+        colorscale="RdYlGn",
+        zmid=0,
+        colorbar={"title": surface.name},
+    ))
+    fig.update_layout(xaxis_title=x_name, yaxis_title=y_name, template="plotly_white")
+    return fig
+
+@dataclass(slots=True)
+class LazySurface:
+    """
+    2-D surface computed in tiles only when they are viewed, like a map:
+    at zoom `z` each axis range is split in 2**z tiles of `tile_size` samples.
+    """
+    instance: EventModel
+    y: tuple          # (field, low, high)
+    x: tuple          # (field, low, high)
+    tile_size: int = 256
+    output: str = "profit"
+    _tiles: dict = field(default_factory=dict, repr=False)
+
+    def _axis(self, axis: tuple, zoom: int, index: int) -> np.ndarray:
+        _, low, high = axis
+        span = (high - low) / 2 ** zoom
+        return np.linspace(low + index * span, low + (index + 1) * span, self.tile_size, endpoint=False)
+
+    @instrumented()
+    def tile(self, zoom: int, iy: int, ix: int) -> Surface:
+        key = (zoom, iy, ix)
+        if key not in self._tiles:
+            self._tiles[key] = profit_surface(self.instance, {
+                self.y[0]: self._axis(self.y, zoom, iy),
+                self.x[0]: self._axis(self.x, zoom, ix),
+            }, self.output)
+        return self._tiles[key]
+
+    def _zoom_for(self, axis: tuple, window: tuple, pixels: int) -> int:
+        _, low, high = axis
+        samples_needed = pixels * (high - low) / max(window[1] - window[0], 1e-12)
+        return max(0, math.ceil(math.log2(samples_needed / self.tile_size)))
+
+    def _tile_range(self, axis: tuple, window: tuple, zoom: int) -> range:
+        _, low, high = axis
+        span = (high - low) / 2 ** zoom
+        first = max(0, math.floor((window[0] - low) / span))
+        last = min(2 ** zoom - 1, math.ceil((window[1] - low) / span) - 1)
+        return range(first, max(first, last) + 1)
+
+    def view(self, y_window: tuple, x_window: tuple, pixels: int = 512) -> Surface:
+        """
+        The part of the surface inside the windows `(low, high)`, with at least `pixels`
+        samples per axis: only the tiles that cover the windows are computed (and cached).
+        """
+        zoom = max(self._zoom_for(self.y, y_window, pixels), self._zoom_for(self.x, x_window, pixels))
+        rows = [[self.tile(zoom, iy, ix) for ix in self._tile_range(self.x, x_window, zoom)]
+                for iy in self._tile_range(self.y, y_window, zoom)]
+        ys = np.concatenate([row[0].coords[self.y[0]] for row in rows])
+        xs = np.concatenate([t.coords[self.x[0]] for t in rows[0]])
+        values = np.block([[t.values for t in row] for row in rows])
+        keep_y = (ys >= y_window[0]) & (ys <= y_window[1])
+        keep_x = (xs >= x_window[0]) & (xs <= x_window[1])
+        return Surface(
+            (self.y[0], self.x[0]),
+            {self.y[0]: ys[keep_y], self.x[0]: xs[keep_x]},
+            values[np.ix_(keep_y, keep_x)],
+            self.output,
+        )
+
+# labels of the TrofeoAmicizia fields in the charts
+TROFEO_AMICIZIA_LABELS = {
+    "participation_price": "Prezzo iscrizione",
+    "participants": "Partecipanti",
+    "photos_per_atlete": "Foto per atleta",
+    "profit_per_photo": "Profitto per foto",
+    "gadget_price": "Costo dei gadget",
+    "categories": "Categorie",
+    "podiums_for_speciality_each_category": "Podii di specialità a cat.",
+    "coaches_salary_for_round": "Salario allenatori a turno",
+    "participation_medal_price": "Costo medaglia partecipazione",
+    "average_podium_medal_price": "Costo medio medaglia podio",
+    "average_cup_price": "Costo medio coppa",
+    "available_coaches": "Allenatori disponibili",
+    "judges_salary_for_round": "Salario giudici a turno",
+    "food_cost": "Costo cibo",
+}
+TORNADO_PARAMS = tuple(TROFEO_AMICIZIA_LABELS)[:8]
 
 def tornado_for_trofeo_amicizia(evento: TrofeoAmicizia, deltas=(0.1, -0.1)):
     """
     Crea un tornado chart di sensitività dell'utile per ciascun parametro numerico.
     """
-    params = {
-        "participation_price": "Prezzo iscrizione",
-        "participants": "Partecipanti",
-        "photos_per_atlete": "Foto per atleta",
-        "profit_per_photo": "Profitto per foto",
-        "gadget_price": "Costo dei gadget",
-        "categories": "Categorie",
-        "podiums_for_speciality_each_category": "Podii di specialità a cat.",
-        "coaches_salary_for_round": "Salario allenatori a turno",
-    }
+    params = {name: TROFEO_AMICIZIA_LABELS[name] for name in TORNADO_PARAMS}
+    return tornado_chart(evento, params, deltas)
+
+@instrumented()
+def tornado_chart(evento: EventModel, params: dict | None = None, deltas=(0.1, -0.1)):
+    """
+    Tornado chart dell'utile di un qualsiasi `EventModel`; `params` è {campo: etichetta}
+    (di default tutti i campi numerici, etichettati col loro nome).
+
+    L'utile è lineare in ogni singolo parametro, quindi ΔProfit = ∂Profit/∂x · x · d è esatto:
+    basta un solo gradiente invece di un clone dell'evento per parametro e per delta. Solo i
+    parametri con soglie di scaglioni (`breakpoints`, es. gli iscritti con gli sconti quantità)
+    sono valutati direttamente, un batch con tutti i delta.
+    """
+    if params is None:
+        params = {name: name for name in numeric_fields(evento)}
     records = []
-    base_profit = evento.profit
+    grad = gradient(evento, params=params)
     for field, label in params.items():
-        for d in deltas:
-            current = getattr(evento, field)
-            changed = current * (1 + d)
-            clone = replace(evento, **{field: changed})
-            delta_profit = clone.profit - base_profit
+        current = getattr(evento, field)
+        changes = [grad[field] * current * d for d in deltas]
+        if evento.breakpoints(field).size:
+            batch = type(evento).from_base(evento, **{field: current * (1 + np.asarray(deltas))})
+            changes = (batch.profit - evento.profit).tolist()
+        for d, delta_profit in zip(deltas, changes):
             records.append(
                 {"Parameter": label, "Scenario": f"{d:+.0%}", "ΔProfit": delta_profit}
             )
+    import pandas as pd
+    import plotly.express as px
     df = pd.DataFrame(records)
     fig = px.bar(
         df,
@@ -55,4 +203,39 @@ def tornado_for_trofeo_amicizia(evento: TrofeoAmicizia, deltas=(0.1, -0.1)):
     fig.update_layout(
         yaxis_title=None,
     )
-    return fig
\ No newline at end of file
+    return fig
+
+def sobol_for_trofeo_amicizia(evento: TrofeoAmicizia, spread: float = 0.1, distributions: dict | None = None, **options):
+    """
+    Indici di Sobol dell'utile per tutti i campi numerici, ognuno uniforme in ±`spread`
+    (salvo quelli in `distributions`), e il loro grafico; `options` va a `sobol_indices`.
+    """
+    from src.sobol import default_distributions, sobol_indices
+    result = sobol_indices(evento, default_distributions(evento, spread, **(distributions or {})), **options)
+    return result, sobol_chart(result, TROFEO_AMICIZIA_LABELS)
+
+@instrumented()
+def sobol_chart(result, labels: dict | None = None, top: int | None = None):
+    """
+    Barre orizzontali degli indici di Sobol (primo ordine e totale, con l'intervallo di
+    confidenza) di un `SobolResult`, dal campo più influente; `top` tiene solo i primi.
+    """
+    order = np.argsort(result.total)[::-1][:top]
+    labels = labels or {}
+    names = [labels.get(result.params[i], result.params[i]) for i in order]
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    for title, values, conf, color in (("Primo ordine", result.first, result.first_conf, "#1f77b4"),
+                                       ("Totale", result.total, result.total_conf, "#ff7f0e")):
+        fig.add_trace(go.Bar(
+            y=names, x=values[order], name=title, orientation="h", marker_color=color,
+            error_x={"type": "data", "symmetric": False,
+                     "array": conf[order, 1] - values[order], "arrayminus": values[order] - conf[order, 0]},
+        ))
+    fig.update_layout(
+        barmode="group",
+        template="plotly_white",
+        xaxis_title="quota della varianza dell'utile",
+        yaxis={"title": None, "autorange": "reversed"},
+    )
+    return fig
@@ -0,0 +1,31 @@
+import numpy as np
+
+from src.event_model import EventModel
+from src.model import TrofeoAmicizia
+
+# Every money figure and KPI returned by `evaluate_batch` for a TrofeoAmicizia.
+OUTPUTS = tuple(TrofeoAmicizia.nodes())
+
+
+class TrofeoAmiciziaBatch(TrofeoAmicizia):
+    """
+    TrofeoAmicizia whose numeric fields are NumPy arrays: one element per scenario.
+
+    Le property e i KPI di `TrofeoAmicizia` funzionano anche su array (i rami passano da
+    `safe_divide`/`ceil_divide_or_inf`), quindi i risultati coincidono con quelli del modello
+    scalare; la classe serve solo a distinguere un batch da un singolo evento.
+    """
+    __slots__ = ()
+
+
+def evaluate_batch(base: EventModel, data=None, **arrays) -> dict[str, np.ndarray]:
+    """
+    Valuta in un solo passaggio vettoriale tutti gli scenari ottenuti da `base`
+    sostituendo i campi indicati (colonne di un DataFrame in `data` o array in `arrays`).
+
+    Gli array vengono combinati con il broadcasting di NumPy e il risultato è un dict
+    {nome figura/KPI: array}, pronto per `pd.DataFrame(...)`. Funziona con ogni `EventModel`.
+
+        evaluate_batch(evento, participants=np.arange(50, 401))["profit"]
+    """
+    return type(base).from_base(base, data, **arrays).results()
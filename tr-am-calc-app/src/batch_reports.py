@@ -0,0 +1,124 @@
+"""
+Genera un report PDF per ogni riga di un file di scenari (CSV, JSON o Parquet).
+
+Ogni riga contiene i campi di `TrofeoAmicizia` (`coaches_for_round`, `judges_for_round` e gli
+scaglioni facoltativi come `sponsorship_tiers` come JSON nel CSV) più le colonne facoltative
+`scenario` (nome del file) e `judges`.
+
+    python -m src.batch_reports scenari.csv -o reports/ --workers 4
+    python -m src.batch_reports scenari.parquet --combined piani_prezzo.pdf
+"""
+import argparse, json, math, os, pathlib, time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from src.analysis import sobol_for_trofeo_amicizia, tornado_for_trofeo_amicizia
+from src.model import ROUND_FIELDS, TIER_FIELDS, TrofeoAmicizia
+from src.render_template import (
+    _logo_b64, _report_template, build_trofeo_amicizia_report, render_trofeo_amicizia_html,
+    trofeo_amicizia_report_sections, warm_chart_renderer,
+)
+
+READERS = {".csv": pd.read_csv, ".json": pd.read_json, ".parquet": pd.read_parquet}
+
+
+def read_scenarios(path: pathlib.Path) -> list[dict]:
+    try:
+        reader = READERS[path.suffix.lower()]
+    except KeyError:
+        raise ValueError(f"unsupported file type {path.suffix!r}, use one of {sorted(READERS)}") from None
+    rows = reader(path).to_dict(orient="records")
+    for i, row in enumerate(rows):
+        for name, value in row.items():
+            # NumPy scalars -> plain Python numbers (they end up in the report tables)
+            row[name] = value.item() if hasattr(value, "item") else value
+        for name in ROUND_FIELDS + TIER_FIELDS:
+            if isinstance(row.get(name), str):
+                row[name] = json.loads(row[name])
+        for name in TIER_FIELDS + ("judges",):
+            # an empty cell is no schedule (no judges: the default of the report)
+            if isinstance(row.get(name), float) and math.isnan(row[name]):
+                row[name] = None
+        if row.get("judges") is not None:
+            # a column with blanks is read as floats
+            row["judges"] = int(row["judges"])
+        row.setdefault("scenario", f"report_{i:04d}")
+    return rows
+
+
+def _init_worker() -> None:
+    # pay Jinja, WeasyPrint and kaleido start-up once per process, not once per report
+    import weasyprint  # noqa: F401
+    _report_template()
+    _logo_b64()
+    warm_chart_renderer()
+
+
+def _render(row: dict, output_dir: pathlib.Path | None, chart_format: str = "png", sobol: bool = False) -> str:
+    """Writes the PDF of one scenario (or returns its HTML when `output_dir` is None)."""
+    row = dict(row)
+    scenario = str(row.pop("scenario"))
+    judges = row.pop("judges", None)
+    evento = TrofeoAmicizia(**row)
+    tornado = tornado_for_trofeo_amicizia(evento)
+    sobol_fig = sobol_for_trofeo_amicizia(evento, seed=0)[1] if sobol else None
+    sections = trofeo_amicizia_report_sections(evento, judges=judges)
+    if output_dir is None:
+        return render_trofeo_amicizia_html(evento, tornado, **sections, chart_format=chart_format, sobol_fig=sobol_fig)
+    pdf_bytes, _ = build_trofeo_amicizia_report(evento, tornado, **sections, chart_format=chart_format,
+                                                sobol_fig=sobol_fig)
+    path = output_dir / f"{scenario}.pdf"
+    path.write_bytes(pdf_bytes)
+    return str(path)
+
+
+def generate_reports(rows: list[dict], output_dir: pathlib.Path | None = None, *,
+                     combined: pathlib.Path | None = None, workers: int | None = None,
+                     chart_format: str = "png", sobol: bool = False) -> list[str]:
+    """
+    Genera i report in parallelo su `workers` processi (None ⇒ tutti i core).
+    Con `combined` i worker preparano l'HTML e tutte le pagine finiscono in un unico PDF.
+    `chart_format="svg"` inserisce i grafici come grafica vettoriale; con `sobol` ogni report
+    ha anche gli indici di Sobol (±10% su ogni parametro).
+    Restituisce i percorsi dei file scritti.
+    """
+    from weasyprint import HTML
+
+    if output_dir is not None:
+        output_dir.mkdir(parents=True, exist_ok=True)
+    target = None if combined is not None else output_dir
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        results = list(pool.map(_render, rows, [target] * len(rows), [chart_format] * len(rows), [sobol] * len(rows)))
+    if combined is None:
+        return results
+
+    documents = [HTML(string=html, base_url=".").render() for html in results]
+    pages = [page for document in documents for page in document.pages]
+    documents[0].copy(pages).write_pdf(combined)
+    return [str(combined)]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("scenarios", type=pathlib.Path, help="file CSV, JSON o Parquet con gli scenari")
+    parser.add_argument("-o", "--output-dir", type=pathlib.Path, default=pathlib.Path("reports"))
+    parser.add_argument("--combined", type=pathlib.Path, help="scrive un solo PDF con tutti gli scenari")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--svg", action="store_true", help="tornado vettoriale (SVG) invece di PNG")
+    parser.add_argument("--sobol", action="store_true", help="aggiunge gli indici di Sobol (sensitività globale)")
+    args = parser.parse_args(argv)
+
+    rows = read_scenarios(args.scenarios)
+    if not rows:
+        parser.error(f"{args.scenarios} has no scenarios")
+    start = time.perf_counter()
+    written = generate_reports(rows, args.output_dir, combined=args.combined, workers=args.workers,
+                               chart_format="svg" if args.svg else "png", sobol=args.sobol)
+    elapsed = time.perf_counter() - start
+    print(f"{len(rows)} scenari → {len(written)} PDF in {elapsed:.1f} s "
+          f"({len(rows) / elapsed:.1f} documenti/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Benchmark dei percorsi principali: modello, analisi, grafici, PDF e rerun dell'app.
+
+    python -m src.benchmarks --save baseline.json            # misura e salva la baseline
+    python -m src.benchmarks --compare baseline.json         # esce con 1 se qualcosa è più lento
+    python -m src.benchmarks -k sensitivity --threshold 0.1
+
+Ogni benchmark ripete la chiamata abbastanza volte da durare ~0.2 s (come `timeit`) e
+salva il tempo minimo e mediano per chiamata. Un percorso è in regressione quando il suo
+minimo supera quello della baseline di oltre `threshold` (default 25%).
+I benchmark che non possono partire (kaleido senza Chrome, WeasyPrint senza Pango, …) sono saltati.
+
+    python -m src.benchmarks --imports
+
+controlla invece l'avvio a freddo: ogni modulo di `IMPORT_BUDGETS` deve importarsi (in un
+processo nuovo, misurato con `python -X importtime`) entro il suo budget e senza caricare
+le dipendenze pesanti che usa solo su richiesta.
+"""
+import argparse, json, pathlib, platform, statistics, subprocess, sys, time, timeit
+from dataclasses import dataclass
+
+from src.model import TrofeoAmicizia
+
+DEFAULT_THRESHOLD = 0.25
+APP_PATH = pathlib.Path(__file__).parent.parent / "streamlit_app.py"
+
+
+@dataclass(frozen=True, slots=True)
+class Benchmark:
+    name: str
+    setup: callable                  # () -> the callable to time
+    threshold: float | None = None   # looser threshold for noisy paths
+
+
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, threshold: float | None = None):
+    """Registers `setup`, a function that prepares the inputs and returns what to time."""
+    def register(setup):
+        BENCHMARKS[name] = Benchmark(name, setup, threshold)
+        return setup
+    return register
+
+
+def sample_event(**changes) -> TrofeoAmicizia:
+    """The event with the defaults of streamlit_app.py, with `changes` applied (benchmarks, load tests)."""
+    params = dict(
+        participants=205, participation_price=10.0, participation_medal_price=1.4, gadget_price=1.2,
+        categories=11, podiums_for_speciality_each_category=5, average_podium_medal_price=1.85,
+        average_cup_price=8.5, available_coaches=13,
+        coaches_for_round={"turno1": 12, "turno2": 12, "turno3": 11, "turno4": 12, "turno5": 12, "turno6": 0},
+        coaches_salary_for_round=8.0,
+        judges_for_round={"turno1": 0, "turno2": 0, "turno3": 0, "turno4": 1, "turno5": 0, "turno6": 0},
+        judges_salary_for_round=10.0, food_cost=25.0, photos_per_atlete=0.55, profit_per_photo=1.5,
+    )
+    params.update(changes)
+    return TrofeoAmicizia(**params)
+
+
+# Model
+@benchmark("model.profit")
+def _model_profit():
+    # a new instance every call, so nothing comes from the cache
+    return lambda: sample_event().profit
+
+
+@benchmark("model.profit_cached")
+def _model_profit_cached():
+    evento = sample_event()
+    evento.profit
+    return lambda: evento.profit
+
+
+@benchmark("model.evaluate")
+def _model_evaluate():
+    return lambda: sample_event().evaluate()
+
+
+# tiered prices: one binary search per scenario
+TIERS = {0: 1.0, 100: 0.95, 200: 0.9, 300: 0.85, 500: 0.8, 1000: 0.75}
+
+
+@benchmark("model.tiers_total[100000]")
+def _tiers_total():
+    import numpy as np
+    from src.tiers import Tiers
+
+    tiers = Tiers.from_mapping(TIERS)
+    quantities = np.random.default_rng(0).uniform(0, 2000, 100_000)
+    return lambda: tiers.total(quantities)
+
+
+@benchmark("model.break_even_tiered")
+def _break_even_tiered():
+    return lambda: sample_event(participation_medal_tiers=TIERS, sponsorship_tiers={0: 0.0, 150: 0.5}).break_even_participants()
+
+
+# Analysis
+def _sensitivity(size: int):
+    import numpy as np
+    from src.analysis import profit_sensitivity
+
+    evento = sample_event()
+    values = np.linspace(50, 500, size)
+    return lambda: profit_sensitivity(evento, "participants", values)
+
+
+for _size in (10, 1_000, 100_000):
+    benchmark(f"analysis.profit_sensitivity[{_size}]")(lambda size=_size: _sensitivity(size))
+
+
+@benchmark("analysis.tornado")
+def _tornado():
+    from src.analysis import tornado_for_trofeo_amicizia
+    return lambda: tornado_for_trofeo_amicizia(sample_event())
+
+
+@benchmark("analysis.sobol[4096]")
+def _sobol():
+    from src.sobol import sobol_indices
+
+    evento = sample_event()
+    sobol_indices(evento, min_samples=2, max_samples=2)  # scipy.stats import is not part of the measure
+    return lambda: sobol_indices(evento, min_samples=4096, max_samples=4096, seed=0)
+
+
+# Report
+def _chart(format: str, cached: bool):
+    from src.analysis import tornado_for_trofeo_amicizia
+    from src.render_template import _chart_cache, render_chart
+
+    tornado = tornado_for_trofeo_amicizia(sample_event())
+    render_chart(tornado, format)  # kaleido start-up is not part of the measure
+    if cached:
+        return lambda: render_chart(tornado, format)
+
+    def uncached():
+        _chart_cache.clear()
+        return render_chart(tornado, format)
+    return uncached
+
+
+for _format in ("png", "svg"):
+    benchmark(f"report.render_chart[{_format}]", threshold=0.5)(lambda format=_format: _chart(format, False))
+benchmark("report.render_chart_cached")(lambda: _chart("png", True))
+
+
+@benchmark("report.pdf", threshold=0.5)
+def _report_pdf():
+    from src.analysis import tornado_for_trofeo_amicizia
+    from src.render_template import build_trofeo_amicizia_report, trofeo_amicizia_report_sections
+
+    evento = sample_event()
+    tornado = tornado_for_trofeo_amicizia(evento)
+    sections = trofeo_amicizia_report_sections(evento)
+    build_trofeo_amicizia_report(evento, tornado, **sections)
+    return lambda: build_trofeo_amicizia_report(evento, tornado, **sections)
+
+
+# App
+@benchmark("app.rerun", threshold=0.5)
+def _app_rerun():
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(str(APP_PATH), default_timeout=60)
+    app.run()
+    # a rerun with unchanged inputs, as after any widget interaction served from the caches
+    return app.run
+
+
+# Cold start: {module: (seconds, modules it must not import)}
+HEAVY = ("pandas", "plotly", "weasyprint", "jinja2", "scipy")
+IMPORT_BUDGETS = {
+    "src.model": (0.25, HEAVY),
+    "src.batch": (0.25, HEAVY),
+    "src.analysis": (0.3, HEAVY),
+    "src.render_template": (0.3, HEAVY),
+    "src.sobol": (0.25, HEAVY),
+}
+
+
+def import_profile(module: str) -> dict:
+    """Cumulative import time of `module` in a fresh interpreter and the heavy packages it loaded."""
+    code = f"import sys, json, {module}; print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True,
+                          text=True, check=True, cwd=APP_PATH.parent)
+    # stderr lines: "import time: self [us] | cumulative | imported package"
+    cumulative = 0
+    for line in proc.stderr.splitlines():
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative = int(parts[1])
+    return {"seconds": cumulative / 1e6, "loaded": json.loads(proc.stdout)}
+
+
+def check_imports(budgets: dict = IMPORT_BUDGETS, log=None) -> list[str]:
+    """Modules over their import-time budget or loading forbidden packages, as readable lines."""
+    violations = []
+    for module, (budget, forbidden) in budgets.items():
+        result = import_profile(module)
+        if log is not None:
+            log(f"import {module}", result)
+        if result["seconds"] > budget:
+            violations.append(f"import {module}: {_format(result['seconds'])} > budget {_format(budget)}")
+        loaded = sorted(set(result["loaded"]) & set(forbidden))
+        if loaded:
+            violations.append(f"import {module} loads {', '.join(loaded)}")
+    return violations
+
+
+def measure(func, repeat: int = 5) -> dict:
+    """Seconds per call of `func` (min and median of `repeat` timings)."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {"min": min(times), "median": statistics.median(times), "number": number, "repeat": repeat}
+
+
+def run(names=None, repeat: int = 5, log=None) -> dict:
+    """Runs the benchmarks in `names` (default: all) and returns the results document."""
+    results = {}
+    for name in names if names is not None else BENCHMARKS:
+        try:
+            func = BENCHMARKS[name].setup()
+        except Exception as exc:
+            # setup also warms up the path: a failure means a missing dependency or tool
+            reason = (str(exc).strip().splitlines() or [""])[0]
+            results[name] = {"skipped": f"{type(exc).__name__}: {reason}"}
+        else:
+            results[name] = measure(func, repeat)
+        if log is not None:
+            log(name, results[name])
+    return {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+    """
+    Benchmarks of `current` whose minimum is slower than the baseline by more than their
+    threshold, as readable lines. Benchmarks missing or skipped on either side are ignored.
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if "min" not in result or not base or "min" not in base:
+            continue
+        own = BENCHMARKS[name].threshold if name in BENCHMARKS else None
+        limit = max(threshold, own or 0.0)
+        ratio = result["min"] / base["min"]
+        if ratio > 1 + limit:
+            regressions.append(f"{name}: {_format(base['min'])} → {_format(result['min'])} "
+                               f"({ratio - 1:+.0%}, limit {limit:+.0%})")
+    return regressions
+
+
+def _format(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e3), ("µs", 1e6)):
+        if seconds * scale >= 1:
+            return f"{seconds * scale:.3g} {unit}"
+    return f"{seconds * 1e9:.3g} ns"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-k", dest="pattern", help="solo i benchmark il cui nome contiene PATTERN")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", type=pathlib.Path, help="scrive i risultati in JSON")
+    parser.add_argument("--compare", type=pathlib.Path, help="baseline JSON con cui confrontare")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="rallentamento ammesso rispetto alla baseline (0.25 = +25%%)")
+    parser.add_argument("--imports", action="store_true", help="controlla solo i budget di import")
+    args = parser.parse_args(argv)
+
+    if args.imports:
+        violations = check_imports(log=lambda name, r: print(
+            f"{name:<40} {_format(r['seconds']):>10}  {', '.join(r['loaded']) or '-'}"))
+        for line in violations:
+            print(f"OVER BUDGET {line}", file=sys.stderr)
+        return 1 if violations else 0
+
+    names = [n for n in BENCHMARKS if args.pattern is None or args.pattern in n]
+    if not names:
+        parser.error(f"no benchmark matches {args.pattern!r}, available: {', '.join(BENCHMARKS)}")
+
+    def log(name, result):
+        if "skipped" in result:
+            print(f"{name:<40} skipped ({result['skipped']})")
+        else:
+            print(f"{name:<40} {_format(result['min']):>10}  median {_format(result['median']):>10}")
+
+    current = run(names, args.repeat, log)
+    if args.save:
+        args.save.write_text(json.dumps(current, indent=2))
+    if args.compare:
+        regressions = compare(current, json.loads(args.compare.read_text()), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
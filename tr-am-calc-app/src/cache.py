@@ -0,0 +1,80 @@
+import functools
+from dataclasses import dataclass, replace
+
+from src.instrument import profiler
+
+_MISSING = object()
+
+
+@dataclass(slots=True)
+class CacheStats:
+    """Process-wide counters of the derived-value cache."""
+    hits: int = 0
+    misses: int = 0   # values actually (re)computed
+    reused: int = 0   # values copied from the parent instance by `replace_reusing_cache`
+
+    def reset(self) -> None:
+        self.hits = self.misses = self.reused = 0
+
+
+cache_stats = CacheStats()
+
+
+def derived(*depends_on: str):
+    """
+    Memoizes a property or a no-argument KPI method in the instance's `_cache` dict.
+
+    `depends_on` lists the fields and the other derived values it is computed from;
+    `field_dependencies` expands them to the fields only. With the profiler enabled every
+    computation (not the cache hits) is a stage named `<Model>.<name>`.
+    """
+    def decorator(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(self):
+            cache = self._cache
+            value = cache.get(name, _MISSING)
+            if value is _MISSING:
+                cache_stats.misses += 1
+                if profiler.enabled:
+                    with profiler.stage(f"{type(self).__name__}.{name}"):
+                        value = cache[name] = func(self)
+                else:
+                    value = cache[name] = func(self)
+            else:
+                cache_stats.hits += 1
+            return value
+
+        wrapper.depends_on = depends_on
+        return wrapper
+    return decorator
+
+
+@functools.cache
+def field_dependencies(cls, name: str) -> frozenset[str]:
+    """All the dataclass fields of `cls` that the derived value `name` depends on."""
+    if name in cls.__dataclass_fields__:
+        return frozenset((name,))
+    attr = getattr(cls, name)
+    func = attr.fget if isinstance(attr, property) else attr
+    deps = frozenset()
+    for dep in func.depends_on:
+        deps |= field_dependencies(cls, dep)
+    return deps
+
+
+def replace_reusing_cache(instance, **changes):
+    """
+    Like `dataclasses.replace`, but the new instance starts with every cached value of
+    `instance` that does not depend on the changed fields (e.g. changing only
+    `participants` keeps the fixed costs already computed).
+    """
+    clone = replace(instance, **changes)
+    changed = set(changes)
+    for name, value in instance._cache.items():
+        if not field_dependencies(type(instance), name) & changed:
+            clone._cache[name] = value
+            cache_stats.reused += 1
+    return clone
+
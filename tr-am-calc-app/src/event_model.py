@@ -0,0 +1,169 @@
+import functools, math
+from collections.abc import Mapping
+from dataclasses import dataclass, field, fields
+
+import numpy as np
+
+from src.cache import derived, replace_reusing_cache
+from src.tiers import Tiers
+
+
+@dataclass(frozen=True, slots=True)
+class EventModel:
+    """
+    Base class of the event models (`TrofeoAmicizia`, `Recital`, …).
+
+    Un modello dichiara solo i suoi campi e le voci di ricavo e di costo come nodi:
+    property (o KPI senza argomenti) decorate con `derived(*dipendenze)`. Il grafo delle
+    dipendenze viene compilato una volta per classe (`plan`) in un ordine di valutazione
+    piatto, che vale sia per un'istanza sia per un batch di scenari: basta costruire il
+    modello con array NumPy al posto dei numeri (`from_base`). Ogni modello definisce
+    almeno i nodi `revenue` e `total_costs`; `profit` è definito qui.
+    """
+    # derived values computed so far (see `src.cache.derived`)
+    _cache: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    @property
+    def name(self) -> str:
+        return type(self).__name__
+
+    @property
+    @derived("revenue", "total_costs")
+    def profit(self) -> float:
+        return self.revenue - self.total_costs
+
+    def replace(self, **changes):
+        """
+        `dataclasses.replace` that keeps the cached values not affected by `changes`.
+        """
+        return replace_reusing_cache(self, **changes)
+
+    # Graph
+    @classmethod
+    def nodes(cls) -> dict:
+        """{node name: function} of every derived value, in evaluation order."""
+        return _compile(cls)
+
+    @classmethod
+    def plan(cls, outputs) -> list[str]:
+        """The nodes needed for `outputs`, each after the nodes it depends on."""
+        needed = set()
+        stack = list(outputs)
+        nodes = cls.nodes()
+        while stack:
+            name = stack.pop()
+            if name in nodes and name not in needed:
+                needed.add(name)
+                stack.extend(nodes[name].depends_on)
+        return [name for name in nodes if name in needed]
+
+    def evaluate(self, outputs=None) -> dict:
+        """
+        Computes `outputs` (default: every node) following the flat plan, so every
+        dependency is already in the cache when a node is evaluated.
+        """
+        outputs = list(self.nodes()) if outputs is None else list(outputs)
+        for name in self.plan(outputs):
+            value = getattr(self, name)
+            if callable(value):
+                value()
+        return {name: self._cache[name] for name in outputs}
+
+    # Batches of scenarios
+    @classmethod
+    def from_base(cls, base, data=None, **arrays):
+        """
+        A model of class `cls` whose fields are NumPy arrays: the columns of `data`
+        (a DataFrame or a mapping) and `arrays` replace the fields of `base`, every other
+        field is taken from `base`. Mapping fields (e.g. per-round counts) and tier schedules
+        are kept as they are.
+        """
+        overrides = dict(data.items()) if data is not None else {}
+        overrides.update(arrays)
+        values = {}
+        for f in fields(base):
+            if not f.init:
+                continue
+            value = overrides.pop(f.name, getattr(base, f.name))
+            values[f.name] = value if _is_structured(value) else np.asarray(value)
+        if overrides:
+            raise TypeError(f"unknown {type(base).__name__} fields: {sorted(overrides)}")
+        batch = cls(**values)
+        batch.shape  # raises if the arrays cannot be broadcast together
+        return batch
+
+    @property
+    def shape(self) -> tuple:
+        shapes = []
+        for f in fields(self):
+            if not f.init:
+                continue
+            value = getattr(self, f.name)
+            if isinstance(value, Mapping):
+                shapes.extend(np.shape(v) for v in value.values())
+            elif not _is_structured(value):
+                shapes.append(np.shape(value))
+        return np.broadcast_shapes(*shapes)
+
+    def breakpoints(self, param: str) -> np.ndarray:
+        """
+        Values of `param` where the outputs change slope (tier thresholds, see `src.tiers`):
+        between two of them every output is linear in `param`. No thresholds by default.
+        """
+        return np.empty(0)
+
+    def results(self, outputs=None) -> dict[str, np.ndarray]:
+        """`evaluate(outputs)` with every value broadcast to `self.shape`."""
+        shape = self.shape
+        return {name: np.broadcast_to(value, shape) for name, value in self.evaluate(outputs).items()}
+
+
+def _is_structured(value) -> bool:
+    # fields that are not broadcast: per-round mappings, tier schedules, missing schedules
+    return value is None or isinstance(value, Mapping | Tiers)
+
+
+@functools.cache
+def _compile(cls) -> dict:
+    found = {}
+    for klass in reversed(cls.__mro__):
+        for name, attr in vars(klass).items():
+            func = attr.fget if isinstance(attr, property) else attr
+            if hasattr(func, "depends_on"):
+                found[name] = func
+    order = {}
+
+    def visit(name, path=()):
+        if name in order:
+            return
+        if name in path:
+            raise ValueError(f"{cls.__name__}: circular dependency {' -> '.join(path + (name,))}")
+        for dep in found[name].depends_on:
+            if dep in found:
+                visit(dep, path + (name,))
+        order[name] = found[name]
+
+    for name in found:
+        visit(name)
+    return order
+
+
+# Array-safe branches: plain Python on scalars (same results as before), NumPy on batches.
+def _is_scalar(*values) -> bool:
+    return all(np.ndim(v) == 0 and not isinstance(v, np.ndarray) for v in values)
+
+
+def safe_divide(num, den, default: float):
+    """num / den, or `default` where den is zero."""
+    if _is_scalar(num, den):
+        return num / den if den else default
+    num, den = np.broadcast_arrays(np.asarray(num, dtype=float), np.asarray(den, dtype=float))
+    return np.divide(num, den, out=np.full(num.shape, default), where=den != 0)
+
+
+def ceil_divide_or_inf(num, den):
+    """⌈num / den⌉, or infinity where den is ≤0."""
+    if _is_scalar(num, den):
+        return math.inf if den <= 0 else math.ceil(num / den)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(np.asarray(den) <= 0, np.inf, np.ceil(num / den))
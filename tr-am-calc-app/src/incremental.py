@@ -0,0 +1,43 @@
+from dataclasses import dataclass
+
+from src.cache import field_dependencies
+from src.event_model import EventModel
+
+
+@dataclass(frozen=True, slots=True)
+class Update:
+    instance: EventModel
+    changed: dict       # {output: new value}, only the outputs whose value changed
+    recomputed: int     # graph nodes actually recomputed
+
+
+class IncrementalEngine:
+    """
+    Tiene l'ultima istanza di un `EventModel` con tutti i suoi output calcolati.
+    A ogni `update(**campi)` ricalcola solo i nodi del grafo che dipendono dai campi
+    cambiati (gli altri arrivano dalla cache dell'istanza precedente) e restituisce solo
+    gli output il cui valore è cambiato.
+
+        engine = IncrementalEngine(evento)
+        engine.update(gadget_price=1.5).changed   # _gadget_cost, awards_cost, …, profit
+    """
+
+    def __init__(self, instance: EventModel, outputs=None):
+        self.outputs = list(instance.nodes() if outputs is None else outputs)
+        self.instance = instance
+        self.values = instance.evaluate(self.outputs)
+
+    def update(self, **fields) -> Update:
+        changes = {name: value for name, value in fields.items() if getattr(self.instance, name) != value}
+        if not changes:
+            return Update(self.instance, {}, 0)
+        instance = self.instance.replace(**changes)
+        values = instance.evaluate(self.outputs)
+        changed = {name: value for name, value in values.items() if value != self.values[name]}
+        self.instance, self.values = instance, values
+        return Update(instance, changed, len(self.dirty(*changes)))
+
+    def dirty(self, *fields: str) -> list[str]:
+        """The nodes that a change of `fields` would recompute, in evaluation order."""
+        cls = type(self.instance)
+        return [name for name in cls.plan(self.outputs) if field_dependencies(cls, name) & set(fields)]
@@ -0,0 +1,201 @@
+"""
+Calibra il modello sui dati reali: export CSV di iscrizioni e vendite di foto, anche di
+molte edizioni e di diversi GB, letti a blocchi in memoria costante.
+
+    python -m src.ingest iscrizioni.csv foto.csv --engine arrow
+
+- iscrizioni: una riga per iscritto, colonne `edition`, `category`, `price` (quota pagata);
+- foto: una riga per vendita, colonne `edition`, `photos` (foto vendute), `amount`
+  (incasso della società).
+
+Ogni blocco viene ridotto subito a totali per edizione (e categoria), quindi la memoria
+dipende dal numero di edizioni e categorie, non dalla dimensione dei file.
+Un iscritto senza categoria conta comunque (categoria `MISSING_CATEGORY`); le righe senza
+edizione sono scartate, con entrambi gli engine.
+"""
+import argparse, math, pathlib
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from src.model import TrofeoAmicizia
+from src.montecarlo import Fixed, Normal, Poisson
+
+REGISTRATION_COLUMNS = ("edition", "category", "price")
+PHOTO_COLUMNS = ("edition", "photos", "amount")
+ENGINES = ("pandas", "arrow")
+ARROW_BLOCK_SIZE = 1 << 20
+# label of the registrations with an empty category (not counted among the categories)
+MISSING_CATEGORY = ""
+
+
+@dataclass(slots=True)
+class EditionStats:
+    edition: str
+    participants: int = 0
+    registration_revenue: float = 0.0
+    turnout: dict = field(default_factory=dict)   # {category: athletes}
+    photos: int = 0
+    photo_revenue: float = 0.0
+
+    @property
+    def average_price(self) -> float:
+        return self.registration_revenue / self.participants if self.participants else math.nan
+
+    @property
+    def categories(self) -> int:
+        return sum(1 for category in self.turnout if category != MISSING_CATEGORY)
+
+    @property
+    def take_rate(self) -> float:
+        """Photos sold per athlete (`photos_per_atlete`)."""
+        return self.photos / self.participants if self.participants else math.nan
+
+    @property
+    def revenue_per_photo(self) -> float:
+        """Club income per photo sold (`profit_per_photo`)."""
+        return self.photo_revenue / self.photos if self.photos else math.nan
+
+
+def read_chunks(path, columns, *, chunk_size: int = 1_000_000, engine: str = "pandas",
+                memory_map: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    Blocchi di circa `chunk_size` righe delle `columns` del CSV `path`. `engine="pandas"`
+    usa il reader a blocchi di pandas (`memory_map` mappa il file invece di leggerlo),
+    `engine="arrow"` lo streaming reader multi-thread di PyArrow.
+    """
+    columns = list(columns)
+    if engine == "pandas":
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size, memory_map=memory_map,
+                               dtype={"edition": str, "category": str})
+    elif engine == "arrow":
+        import pyarrow as pa
+        from pyarrow import csv
+
+        types = {name: pa.string() for name in ("edition", "category") if name in columns}
+        # the reader prefetches several blocks: small blocks keep the memory bounded,
+        # they are grouped into chunks of `chunk_size` rows before going to pandas
+        reader = csv.open_csv(
+            path,
+            read_options=csv.ReadOptions(block_size=ARROW_BLOCK_SIZE),
+            convert_options=csv.ConvertOptions(include_columns=columns, column_types=types),
+        )
+        batches, rows = [], 0
+        for batch in reader:
+            batches.append(batch)
+            rows += batch.num_rows
+            if rows >= chunk_size:
+                yield pa.Table.from_batches(batches).to_pandas()
+                batches, rows = [], 0
+        if batches:
+            yield pa.Table.from_batches(batches).to_pandas()
+    else:
+        raise ValueError(f"unknown engine {engine!r}, use one of {ENGINES}")
+
+
+def _normalize(chunk: pd.DataFrame) -> pd.DataFrame:
+    # pandas reads an empty cell as NaN, Arrow as "": the same rows for both engines
+    chunk = chunk[chunk["edition"].fillna("") != ""]
+    if "category" in chunk:
+        chunk = chunk.assign(category=chunk["category"].fillna(MISSING_CATEGORY))
+    return chunk
+
+
+def ingest(registrations, photo_sales=None, **read_options) -> dict[str, EditionStats]:
+    """
+    Totali per edizione dei due export (`read_options` vanno a `read_chunks`), ordinati
+    per edizione. Le edizioni presenti solo fra le foto hanno 0 iscritti.
+    """
+    stats: dict[str, EditionStats] = {}
+
+    def edition(name) -> EditionStats:
+        return stats.setdefault(name, EditionStats(name))
+
+    for chunk in read_chunks(registrations, REGISTRATION_COLUMNS, **read_options):
+        grouped = (_normalize(chunk).groupby(["edition", "category"], sort=False, dropna=False)["price"]
+                   .agg(["size", "sum"]))
+        for (name, category), (size, total) in zip(grouped.index, grouped.itertuples(index=False)):
+            s = edition(name)
+            s.participants += int(size)
+            s.registration_revenue += float(total)
+            s.turnout[category] = s.turnout.get(category, 0) + int(size)
+    if photo_sales is not None:
+        for chunk in read_chunks(photo_sales, PHOTO_COLUMNS, **read_options):
+            grouped = _normalize(chunk).groupby("edition", sort=False)[["photos", "amount"]].sum()
+            for name, (photos, amount) in zip(grouped.index, grouped.itertuples(index=False)):
+                s = edition(name)
+                s.photos += int(photos)
+                s.photo_revenue += float(amount)
+    return dict(sorted(stats.items()))
+
+
+def calibrate(base: TrofeoAmicizia, history: dict[str, EditionStats], edition: str | None = None) -> TrofeoAmicizia:
+    """
+    `base` con i campi stimati dall'edizione `edition` (default l'ultima): iscritti, quota
+    media, categorie, foto per atleta e incasso per foto (se ci sono vendite di foto).
+    """
+    s = history[edition if edition is not None else list(history)[-1]]
+    if s.participants < 2:
+        raise ValueError(f"edition {s.edition!r} has {s.participants} registrations")
+    changes = dict(participants=s.participants, participation_price=s.average_price, categories=s.categories)
+    if s.photos:
+        changes.update(photos_per_atlete=s.take_rate, profit_per_photo=s.revenue_per_photo)
+    return base.replace(**changes)
+
+
+def _spread(values: list[float]):
+    values = pd.Series([v for v in values if not math.isnan(v)], dtype=float)
+    if values.empty:
+        return None
+    if len(values) < 2 or values.std() == 0:
+        return Fixed(float(values.iloc[0]))
+    return Normal(float(values.mean()), float(values.std()))
+
+
+def fit_distributions(history: dict[str, EditionStats]) -> dict:
+    """
+    Distribuzioni per `simulate_profit` stimate fra le edizioni: iscritti Poisson (Normal
+    se la varianza supera la media), foto per atleta e incasso per foto Normal; con una sola
+    edizione i valori restano fissi (gli iscritti Poisson).
+    """
+    turnout = pd.Series([s.participants for s in history.values() if s.participants], dtype=float)
+    if turnout.empty:
+        raise ValueError("no registrations in the history")
+    distributions = {}
+    if len(turnout) > 1 and turnout.var() > turnout.mean():
+        distributions["participants"] = Normal(float(turnout.mean()), float(turnout.std()))
+    else:
+        distributions["participants"] = Poisson(float(turnout.mean()))
+    for name, values in (("photos_per_atlete", [s.take_rate for s in history.values()]),
+                         ("profit_per_photo", [s.revenue_per_photo for s in history.values()])):
+        dist = _spread(values)
+        if dist is not None:
+            distributions[name] = dist
+    return distributions
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("registrations", type=pathlib.Path, help="CSV delle iscrizioni")
+    parser.add_argument("photo_sales", type=pathlib.Path, nargs="?", help="CSV delle vendite di foto")
+    parser.add_argument("--engine", choices=ENGINES, default="pandas")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--memory-map", action="store_true")
+    args = parser.parse_args(argv)
+
+    history = ingest(args.registrations, args.photo_sales, chunk_size=args.chunk_size,
+                     engine=args.engine, memory_map=args.memory_map)
+    table = pd.DataFrame([
+        {"edizione": s.edition, "iscritti": s.participants, "quota media": s.average_price,
+         "categorie": s.categories, "foto per atleta": s.take_rate, "incasso per foto": s.revenue_per_photo}
+        for s in history.values()
+    ])
+    print(table.to_string(index=False))
+    print()
+    for name, dist in fit_distributions(history).items():
+        print(f"{name}: {dist}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Strumentazione opzionale dei percorsi caldi: tempo, chiamate e picco di memoria per fase.
+
+Disattivata di default: ogni punto strumentato costa un solo controllo di `profiler.enabled`.
+Si attiva con `profiler.enable()` (o `profile()` per un solo blocco di codice), oppure
+all'avvio con la variabile d'ambiente `TR_AM_CALC_PROFILE=1` (`=memory` per misurare anche
+le allocazioni con tracemalloc, che rallenta sensibilmente).
+
+    with profile(memory=True) as p:
+        build_trofeo_amicizia_report(evento, tornado, **sections)
+    p.log()          # una riga JSON per fase
+    p.records()      # [{"stage": "report.write_pdf", "calls": 1, "total_ms": …, "peak_kb": …}, …]
+
+Più blocchi `profile()` possono sovrapporsi (es. sessioni Streamlit concorrenti): il profiler
+resta attivo finché non esce l'ultimo, e ogni blocco raccoglie solo le fasi del proprio thread.
+"""
+import contextvars, functools, json, logging, os, threading, time, tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+logger = logging.getLogger("tr_am_calc.profiling")
+
+
+@dataclass(slots=True)
+class StageStats:
+    calls: int = 0
+    seconds: float = 0.0      # inclusive of the nested stages
+    peak_bytes: int | None = None   # largest allocation peak of one call (memory tracking only)
+
+
+def _records(stats: dict[str, StageStats]) -> list[dict]:
+    items = sorted(stats.items(), key=lambda item: -item[1].seconds)
+    return [
+        {
+            "stage": name,
+            "calls": s.calls,
+            "total_ms": s.seconds * 1000,
+            "mean_ms": s.seconds * 1000 / s.calls,
+            "peak_kb": None if s.peak_bytes is None else s.peak_bytes / 1024,
+        }
+        for name, s in items
+    ]
+
+
+def _log(records: list[dict], level: int) -> None:
+    for record in records:
+        logger.log(level, json.dumps(record), extra={"profile": record})
+
+
+class ProfileSession:
+    """The stages recorded inside one `profile()` block (in its thread), see `Profiler.records`."""
+
+    def __init__(self, lock: threading.Lock):
+        self.stats: dict[str, StageStats] = {}
+        self._lock = lock
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stats.clear()
+
+    def records(self) -> list[dict]:
+        with self._lock:
+            return _records(self.stats)
+
+    def log(self, level: int = logging.INFO) -> None:
+        _log(self.records(), level)
+
+
+# the `profile()` block the current thread (or task) is in
+_session: contextvars.ContextVar[ProfileSession | None] = contextvars.ContextVar("profile_session", default=None)
+
+
+class Profiler:
+    """
+    Process-wide stage statistics; stages can be nested and run in any thread.
+
+    The profiler is on while it is enabled explicitly (`enable()`, the environment variable)
+    or while at least one `profile()` block is open; tracemalloc runs while any of them
+    asks for memory tracking.
+    """
+
+    def __init__(self, enabled: bool = False, memory: bool = False):
+        self.enabled = False
+        self.memory = False
+        self.stats: dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracemalloc = False
+        self._explicit = self._explicit_memory = False
+        self._sessions = self._memory_sessions = 0   # open `profile()` blocks
+        if enabled:
+            self.enable(memory=memory)
+
+    def enable(self, memory: bool = False) -> None:
+        with self._lock:
+            self._explicit, self._explicit_memory = True, memory
+            self._update()
+
+    def disable(self) -> None:
+        """Ends the explicit enable; the open `profile()` blocks keep the profiler on."""
+        with self._lock:
+            self._explicit = self._explicit_memory = False
+            self._update()
+
+    def _join(self, memory: bool) -> None:
+        with self._lock:
+            self._sessions += 1
+            self._memory_sessions += memory
+            self._update()
+
+    def _leave(self, memory: bool) -> None:
+        with self._lock:
+            self._sessions -= 1
+            self._memory_sessions -= memory
+            self._update()
+
+    def _update(self) -> None:
+        # called with the lock held
+        memory = self._explicit_memory or self._memory_sessions > 0
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        elif not memory and self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        self.memory = memory
+        self.enabled = self._explicit or self._sessions > 0
+
+    def reset(self) -> None:
+        """Clears the process-wide statistics (not those of the open `profile()` blocks)."""
+        with self._lock:
+            self.stats.clear()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Records one call of the stage `name` (only while the profiler is enabled)."""
+        if not self.enabled:
+            yield
+            return
+        memory = self.memory and tracemalloc.is_tracing()
+        stack = self._stack()
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            stack.append([current, current])
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak_bytes = None
+            if memory:
+                # the peak of a nested stage is also a peak of the stages around it
+                base, peak = stack.pop()
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                if stack:
+                    stack[-1][1] = max(stack[-1][1], peak)
+                peak_bytes = peak - base
+            session = _session.get()
+            with self._lock:
+                for table in (self.stats, session.stats) if session is not None else (self.stats,):
+                    stats = table.setdefault(name, StageStats())
+                    stats.calls += 1
+                    stats.seconds += elapsed
+                    if peak_bytes is not None:
+                        stats.peak_bytes = max(stats.peak_bytes or 0, peak_bytes)
+
+    def _stack(self) -> list:
+        # [traced memory at the start, peak so far] of the open stages of this thread
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def records(self) -> list[dict]:
+        """One dict per stage, slowest first."""
+        with self._lock:
+            return _records(self.stats)
+
+    def log(self, level: int = logging.INFO) -> None:
+        """Writes one JSON line per stage to the `tr_am_calc.profiling` logger."""
+        _log(self.records(), level)
+
+
+_env = os.environ.get("TR_AM_CALC_PROFILE", "")
+profiler = Profiler(enabled=bool(_env) and _env != "0", memory=_env == "memory")
+
+
+def instrumented(name: str | None = None):
+    """Decorator: every call of the function is a stage (default name: module.function)."""
+    def decorator(func):
+        stage = name or f"{func.__module__.removeprefix('src.')}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            with profiler.stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def profile(memory: bool = False):
+    """
+    Enables the profiler for the duration of the block and yields a `ProfileSession` with
+    the stages run in it (by this thread). Blocks may overlap, also in different threads:
+    the profiler, and tracemalloc, stop when the last one exits.
+    """
+    session = ProfileSession(profiler._lock)
+    token = _session.set(session)
+    profiler._join(memory)
+    try:
+        yield session
+    finally:
+        profiler._leave(memory)
+        _session.reset(token)
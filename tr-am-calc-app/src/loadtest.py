@@ -0,0 +1,132 @@
+"""
+Prova di carico di `src.service`: migliaia di client concorrenti, ognuno con la sua
+connessione keep-alive, inviano scenari casuali a `/evaluate`; al termine latenza p50/p99 e
+richieste al secondo.
+
+    python -m src.service --port 8600 &
+    python -m src.loadtest --clients 2000 --requests 20 --sensitivity 0.1
+
+Il client HTTP è minimo (asyncio puro), così il costo per richiesta è del servizio e non
+della libreria; servono tanti descrittori di file quanti client (`ulimit -n`).
+"""
+import argparse, asyncio, json, random, time
+from dataclasses import dataclass, field, fields
+
+import numpy as np
+
+from src.benchmarks import sample_event
+from src.schedule import RoundCounts
+from src.tiers import Tiers
+
+
+@dataclass(slots=True)
+class Results:
+    latencies: list[float] = field(default_factory=list)   # seconds, successful requests only
+    statuses: dict[int, int] = field(default_factory=dict)
+    failures: int = 0                                        # connections refused or dropped
+    elapsed: float = 0.0
+
+    def summary(self) -> dict:
+        ok = np.asarray(self.latencies) * 1000
+        return {
+            "requests": sum(self.statuses.values()),
+            "ok": len(ok),
+            "statuses": dict(sorted(self.statuses.items())),
+            "failures": self.failures,
+            "elapsed_s": self.elapsed,
+            "req_per_s": len(ok) / self.elapsed if self.elapsed else 0.0,
+            "p50_ms": float(np.percentile(ok, 50)) if len(ok) else None,
+            "p99_ms": float(np.percentile(ok, 99)) if len(ok) else None,
+        }
+
+
+def payloads(rng: random.Random, sensitivity: float):
+    """Endless TrofeoAmicizia scenarios around the defaults of the app."""
+    base = sample_event()
+    params = {f.name: getattr(base, f.name) for f in fields(base) if f.init}
+    params = {k: v.to_dict() if isinstance(v, RoundCounts | Tiers) else v for k, v in params.items()}
+    while True:
+        yield json.dumps({
+            "model": "TrofeoAmicizia",
+            "params": params | {
+                "participants": rng.randint(50, 400),
+                "participation_price": round(rng.uniform(6, 15), 2),
+                "photos_per_atlete": round(rng.uniform(0.2, 1.0), 2),
+            },
+            "sensitivity": rng.random() < sensitivity,
+        }).encode()
+
+
+async def _post(reader, writer, host: str, path: str, body: bytes) -> int:
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    length = next(int(line.split(":", 1)[1]) for line in lines[1:] if line.lower().startswith("content-length:"))
+    await reader.readexactly(length)
+    return status
+
+
+async def _client(host: str, port: int, n: int, bodies, results: Results, start: asyncio.Event) -> None:
+    await start.wait()
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        results.failures += 1
+        return
+    try:
+        for _ in range(n):
+            t0 = time.perf_counter()
+            status = await _post(reader, writer, host, "/evaluate", next(bodies))
+            results.statuses[status] = results.statuses.get(status, 0) + 1
+            if status == 200:
+                results.latencies.append(time.perf_counter() - t0)
+    except (OSError, asyncio.IncompleteReadError):
+        results.failures += 1
+    finally:
+        writer.close()
+
+
+async def run(host: str = "127.0.0.1", port: int = 8600, *, clients: int = 1000, requests: int = 10,
+              sensitivity: float = 0.0, seed: int = 0) -> Results:
+    """`clients` concurrent connections sending `requests` requests each."""
+    bodies = payloads(random.Random(seed), sensitivity)
+    results = Results()
+    start = asyncio.Event()
+    tasks = [asyncio.create_task(_client(host, port, requests, bodies, results, start)) for _ in range(clients)]
+    t0 = time.perf_counter()
+    start.set()
+    await asyncio.gather(*tasks)
+    results.elapsed = time.perf_counter() - t0
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--clients", type=int, default=1000, help="connessioni concorrenti")
+    parser.add_argument("--requests", type=int, default=10, help="richieste per client")
+    parser.add_argument("--sensitivity", type=float, default=0.0,
+                        help="quota di richieste che chiedono anche la sensibilità (0–1)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="stampa il riepilogo in JSON")
+    args = parser.parse_args(argv)
+
+    summary = asyncio.run(run(args.host, args.port, clients=args.clients, requests=args.requests,
+                              sensitivity=args.sensitivity, seed=args.seed)).summary()
+    if args.json:
+        print(json.dumps(summary))
+        return
+    print(f"{summary['requests']} richieste da {args.clients} client in {summary['elapsed_s']:.2f} s")
+    print(f"  ok: {summary['ok']}  stati: {summary['statuses']}  errori di connessione: {summary['failures']}")
+    if summary["ok"]:
+        print(f"  {summary['req_per_s']:,.0f} req/s   p50 {summary['p50_ms']:.1f} ms   p99 {summary['p99_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
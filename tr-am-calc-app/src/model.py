@@ -1,10 +1,23 @@
 import math
-from dataclasses import dataclass, replace
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.cache import derived
+from src.event_model import EventModel, ceil_divide_or_inf, safe_divide
+from src.schedule import RoundCounts
+from src.sensitivity import linear_pieces, partial_derivative, second_difference, second_partial_derivative
+from src.tiers import Tiers, tiered
 
 # from typing import Callable
 
+# Fields with a tier schedule (`Tiers`, a `{start: rate}` dict or None).
+TIER_FIELDS = ("participation_medal_tiers", "gadget_tiers", "cup_tiers", "sponsorship_tiers")
+# Fields with a count per round (`RoundCounts` or a `{round: count}` dict), never broadcast.
+ROUND_FIELDS = ("coaches_for_round", "judges_for_round")
+
 @dataclass(frozen=True, slots=True)
-class TrofeoAmicizia:
+class TrofeoAmicizia(EventModel):
     participants: int
     participation_price: float
     participation_medal_price: float
@@ -16,9 +29,9 @@ class TrofeoAmicizia:
     average_cup_price: float
 
     available_coaches: int
-    coaches_for_round: dict
+    coaches_for_round: dict | RoundCounts
     coaches_salary_for_round: float
-    judges_for_round: dict
+    judges_for_round: dict | RoundCounts
     judges_salary_for_round: float
 
     food_cost: float
@@ -26,58 +39,108 @@ class TrofeoAmicizia:
     photos_per_atlete: float
     profit_per_photo: float
 
+    # quantity discounts, as a share of the price by units bought (see `src.tiers`)
+    participation_medal_tiers: Tiers | None = None
+    gadget_tiers: Tiers | None = None
+    cup_tiers: Tiers | None = None
+    # sponsorship, € per participant by number of participants
+    sponsorship_tiers: Tiers | None = None
+
     def __post_init__(self):
-        if self.participants <= 1:
+        participants = self.participants
+        # plain comparison for a single event, np.any only for batches
+        if participants <= 1 if isinstance(participants, int | float) else np.any(np.asarray(participants) <= 1):
             raise ValueError("participants must be > 0")
+        for name in TIER_FIELDS:
+            value = getattr(self, name)
+            if value is not None and not isinstance(value, Tiers):
+                object.__setattr__(self, name, Tiers.from_mapping(value))
+        # converted once here, not in every node (nor in the Dual clones of the sensitivity)
+        for name in ROUND_FIELDS:
+            value = getattr(self, name)
+            if not isinstance(value, RoundCounts):
+                object.__setattr__(self, name, RoundCounts.from_mapping(value))
 
     @property
     def name(self)-> str:
         return "Trofeo dell'Amicizia"
 
+    @property
+    def rounds(self) -> tuple:
+        """Round index of the event: the coaches' rounds, then those with judges only."""
+        return tuple(dict.fromkeys((*self.coaches_for_round, *self.judges_for_round)))
+
+    def breakpoints(self, param: str) -> np.ndarray:
+        """Thresholds of the tiers in `param`: participants (medals, gadgets, sponsorship) or categories (cups)."""
+        if param == "participants":
+            schedules, units = (self.participation_medal_tiers, self.gadget_tiers, self.sponsorship_tiers), 1
+        elif param == "categories":
+            schedules, units = (self.cup_tiers,), 3   # cups per category
+        else:
+            return np.empty(0)
+        starts = [t.starts[1:] / units for t in schedules if t is not None]
+        return np.unique(np.concatenate(starts)) if starts else np.empty(0)
+
     # Income
     @property
+    @derived("participants", "participation_price")
     def _registration_sales(self) -> float:
         return self.participants * self.participation_price
 
     @property
+    @derived("participants", "photos_per_atlete")
     def _tot_photos_exp(self) -> float:
         return self.participants * self.photos_per_atlete
 
     @property
+    @derived("_tot_photos_exp", "profit_per_photo")
     def _photo_sales(self) -> float:
         return self._tot_photos_exp * self.profit_per_photo
 
     @property
+    @derived("participants", "sponsorship_tiers")
+    def _sponsorship_sales(self) -> float:
+        if self.sponsorship_tiers is None:
+            return 0.0
+        return self.sponsorship_tiers.total(self.participants)
+
+    @property
+    @derived("_registration_sales", "_photo_sales", "_sponsorship_sales")
     def revenue(self) -> float:
-        return self._registration_sales + self._photo_sales
+        return self._registration_sales + self._photo_sales + self._sponsorship_sales
 
     # Workers cost
     @property
+    @derived("coaches_for_round", "coaches_salary_for_round")
     def _workers_cost(self) -> float:
-        workers_cost_acc = 0
-        for workers in self.coaches_for_round.values():
-            workers_cost_acc += workers * self.coaches_salary_for_round
-        return workers_cost_acc
+        return self.coaches_for_round.cost(self.coaches_salary_for_round)
 
     @property
+    @derived("judges_for_round", "judges_salary_for_round")
     def _judges_cost(self) -> float:
-        judges_cost_acc = 0
-        for judges in self.judges_for_round.values():
-            judges_cost_acc += judges * self.judges_salary_for_round
-        return judges_cost_acc
+        return self.judges_for_round.cost(self.judges_salary_for_round)
 
     @property
+    @derived("coaches_for_round", "available_coaches")
+    def rounds_over_capacity(self) -> int:
+        """Rounds that need more coaches than `available_coaches` (0 = feasible schedule)."""
+        return self.coaches_for_round.rounds_over(self.available_coaches)
+
+    @property
+    @derived("_judges_cost", "_workers_cost")
     def total_workers_cost(self) -> float:
         return self._judges_cost + self._workers_cost
 
     # Costs for the awarding
     @property
+    @derived("average_cup_price", "categories", "cup_tiers")
     def _all_cups_cost(self) -> float:
-        return (self.average_cup_price * 3
-                * self.categories
+        return (self.average_cup_price
+                * tiered(self.cup_tiers, self.categories * 3)
                 )
 
     @property
+    @derived("podiums_for_speciality_each_category", "categories", "average_podium_medal_price")
     def _all_medals_podiums_cost(self) -> float:
         return (self.podiums_for_speciality_each_category
                 * self.categories
@@ -85,19 +148,23 @@ class TrofeoAmicizia:
                 )
 
     @property
+    @derived("_all_cups_cost", "_all_medals_podiums_cost")
     def total_podium_cost(self) -> float:
         return self._all_cups_cost + self._all_medals_podiums_cost
 
     # Costs of things to give to everyone
     @property
+    @derived("participation_medal_price", "participants", "participation_medal_tiers")
     def _participation_medals_cost(self) -> float:
-        return self.participation_medal_price * self.participants
+        return self.participation_medal_price * tiered(self.participation_medal_tiers, self.participants)
 
     @property
+    @derived("participants", "gadget_price", "gadget_tiers")
     def _gadget_cost(self) -> float:
-        return self.participants * self.gadget_price
+        return tiered(self.gadget_tiers, self.participants) * self.gadget_price
 
     @property
+    @derived("total_podium_cost", "_gadget_cost", "_participation_medals_cost")
     def awards_cost(self) -> float:
         return (self.total_podium_cost
                 + self._gadget_cost
@@ -106,22 +173,22 @@ class TrofeoAmicizia:
 
     # Aggregation
     @property
+    @derived("awards_cost")
     def variable_costs(self) -> float:
         return self.awards_cost
 
     @property
+    @derived("total_workers_cost", "food_cost")
     def fixed_costs(self) -> float:
         return self.total_workers_cost + self.food_cost
 
     @property
+    @derived("variable_costs", "fixed_costs")
     def total_costs(self) -> float:
         return self.variable_costs + self.fixed_costs
 
-    @property
-    def profit(self) -> float:
-        return self.revenue - self.total_costs
-
     # KPI
+    @derived("total_costs", "participants")
     def cost_per_participant(self) -> float:
         """
         Average total cost per athlete.
@@ -132,6 +199,7 @@ class TrofeoAmicizia:
         """
         return self.total_costs / self.participants
 
+    @derived("profit", "participants")
     def profit_per_participant(self) -> float:
         """
         Net profit generated by each athlete.
@@ -141,6 +209,7 @@ class TrofeoAmicizia:
         """
         return self.profit / self.participants
 
+    @derived("revenue", "variable_costs", "participants")
     def contribution_margin_per_participant(self) -> float:
         """
         Revenue minus variable costs for one participant.
@@ -152,6 +221,7 @@ class TrofeoAmicizia:
         return ((self.revenue - self.variable_costs) /
                 self.participants)
 
+    @derived("profit", "revenue")
     def profit_margin_pct(self) -> float:
         """
         Overall profit as a share of total turnover (0–1 scale).
@@ -160,21 +230,36 @@ class TrofeoAmicizia:
         Confrontalo con edizioni precedenti o benchmark di settore;
         un margine in calo indica costi in crescita o ricavi in discesa.
         """
-        return self.profit / self.revenue if self.revenue else 0.0
+        return safe_divide(self.profit, self.revenue, 0.0)
 
-    def break_even_participants(self) -> int:
+    @derived("participants", "profit", "dprofit_dparticipants")
+    def break_even_participants(self) -> int | float:
         """
         Minimum number of athletes required to hit break‑even
-        (rounded up to the next integer).
+        (rounded up to the next integer), or math.inf. See `src.solver` for any other
+        parameter or target.
 
         Se il risultato è, ad esempio, 280, servono almeno 280 iscrizioni paganti affinché
         l’evento non vada in perdita.
-        math.inf significa che il margine di contribuzione è
-        ≤0—raggiungere il pareggio è impossibile con i prezzi/costi attuali.
+        math.inf significa che ogni iscritto in più porta un utile ≤0 (`dprofit_dparticipants`):
+        raggiungere il pareggio è impossibile con i prezzi/costi attuali.
         """
-        m = self.contribution_margin_per_participant()
-        return math.inf if m <= 0 else math.ceil(self.fixed_costs / m)
-
+        if not self.breakpoints("participants").size:
+            # the profit is linear in the participants: n* = n − profit / (∂profit/∂n)
+            m = self.dprofit_dparticipants()
+            return ceil_divide_or_inf(self.participants * m - self.profit, m)
+        # linear between two tier thresholds: the first piece where the profit reaches 0 while growing
+        pieces = linear_pieces(self, "participants")
+        profit = pieces.model.profit
+        with np.errstate(divide="ignore", invalid="ignore"):
+            root = np.maximum(pieces.point - profit.value / profit.grad, pieces.lower)
+        root = np.where((profit.grad > 0) & (root < pieces.upper), root, np.inf).min(axis=0)
+        n = np.ceil(root)
+        if n.ndim == 0:
+            return math.inf if math.isinf(n) else int(n)
+        return n
+
+    @derived("variable_costs", "fixed_costs")
     def variable_to_fixed_ratio(self) -> float:
         """
         Ratio of variable costs to fixed costs.
@@ -183,8 +268,9 @@ class TrofeoAmicizia:
         <1 indica una struttura a costi fissi elevata; i profitti allora oscilleranno fortemente al
          variare del numero di partecipanti.
         """
-        return self.variable_costs / self.fixed_costs if self.fixed_costs else math.inf
+        return safe_divide(self.variable_costs, self.fixed_costs, math.inf)
 
+    @derived("revenue", "participants")
     def average_revenue_per_participant(self) -> float:
         """
         ARPP – Average Revenue Per Participant.
@@ -195,6 +281,7 @@ class TrofeoAmicizia:
         """
         return self.revenue / self.participants
 
+    @derived("_photo_sales", "revenue")
     def photo_revenue_ratio(self) -> float:
         """
         Ratio of photo revenue to total revenue.
@@ -202,22 +289,21 @@ class TrofeoAmicizia:
         Valori vicini a 1 (100%) indicano che le foto rappresentano la principale fonte di ricavo,
         mentre valori prossimi a 0 indicano che il fatturato è trainato dalle iscrizioni (o da altre fonti).
         """
-        return self._photo_sales / self.revenue if self.revenue else 0.0
+        return safe_divide(self._photo_sales, self.revenue, 0.0)
 
+    @derived("profit")
     def dprofit_dparticipants(self) -> float:
         """
-        Approximate marginal profit of adding one more participant.
+        Marginal profit of adding one more participant.
 
         Un valore positivo indica quanti € l’evento guadagna per ogni atleta aggiuntivo.
         Se è negativo, aggiungere partecipanti riduce il profitto.
+        L'utile è lineare negli iscritti fra due soglie degli scaglioni (`src.tiers`) e la
+        derivata è quella a destra, quindi coincide con Profit(n+1) − Profit(n) (soglie intere).
         """
-        # Guard against unrealistic edge cases
-        if self.participants <= 0:
-            return 0.0
-        # Create a clone with one extra participant
-        clone = replace(self, participants=self.participants + 1)
-        return clone.profit - self.profit
+        return partial_derivative(self, "participants")
 
+    @derived("profit")
     def d2profit_dparticipants2(self) -> float:
         """
         Second discrete derivative of profit with respect to participants:
@@ -229,12 +315,9 @@ class TrofeoAmicizia:
         - Valore > 0  ⇒ marginal profit cresce al crescere degli iscritti
                         (economie di scala).
 
-        Per participants ≤ 1 il valore non è definito; ritorna 0.0.
+        Senza scaglioni l'utile è lineare negli iscritti e basta la derivata seconda esatta (0);
+        con sconti quantità o sponsorship a scaglioni è la differenza, diversa da 0 sulle soglie.
         """
-        if self.participants <= 1:
-            return 0.0
-        # profit at n, n+1 and n-1 participants
-        p_n = self.profit
-        p_np1 = replace(self, participants=self.participants + 1).profit
-        p_nm1 = replace(self, participants=self.participants - 1).profit
-        return p_np1 - 2 * p_n + p_nm1
+        if self.breakpoints("participants").size:
+            return second_difference(self, "participants")
+        return second_partial_derivative(self, "participants")
@@ -0,0 +1,251 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from src.batch import TrofeoAmiciziaBatch
+from src.model import TrofeoAmicizia
+
+
+# Distributions ------------------------------------------------------------
+# Any object with `sample(rng, size) -> np.ndarray` can be used; these are
+# module-level dataclasses so they can be pickled to the process pool.
+# `ppf(u)`, the inverse CDF, maps uniform quasi-random points to draws (see `src.sobol`).
+
+@dataclass(frozen=True, slots=True)
+class Fixed:
+    value: float
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        return np.full(size, self.value)
+
+    def ppf(self, u: np.ndarray) -> np.ndarray:
+        return np.full(np.shape(u), self.value)
+
+
+@dataclass(frozen=True, slots=True)
+class Uniform:
+    low: float
+    high: float
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        return rng.uniform(self.low, self.high, size)
+
+    def ppf(self, u: np.ndarray) -> np.ndarray:
+        return self.low + np.asarray(u) * (self.high - self.low)
+
+
+@dataclass(frozen=True, slots=True)
+class Normal:
+    mean: float
+    std: float
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        return rng.normal(self.mean, self.std, size)
+
+    def ppf(self, u: np.ndarray) -> np.ndarray:
+        from scipy.special import ndtri
+        return self.mean + self.std * ndtri(u)
+
+
+@dataclass(frozen=True, slots=True)
+class Triangular:
+    low: float
+    mode: float
+    high: float
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        return rng.triangular(self.low, self.mode, self.high, size)
+
+    def ppf(self, u: np.ndarray) -> np.ndarray:
+        u = np.asarray(u)
+        width = self.high - self.low
+        left = self.low + np.sqrt(u * width * (self.mode - self.low))
+        right = self.high - np.sqrt((1 - u) * width * (self.high - self.mode))
+        return np.where(u * width < self.mode - self.low, left, right)
+
+
+@dataclass(frozen=True, slots=True)
+class Poisson:
+    lam: float
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        return rng.poisson(self.lam, size)
+
+    def ppf(self, u: np.ndarray) -> np.ndarray:
+        from scipy.stats import poisson
+        return poisson.ppf(u, self.lam)
+
+
+# Streaming statistics -----------------------------------------------------
+
+@dataclass(slots=True)
+class RunningMoments:
+    """Count, mean and sum of squared deviations, mergeable (Chan et al.)."""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def update(self, values: np.ndarray) -> None:
+        if values.size:
+            mean = float(values.mean())
+            self.merge(RunningMoments(values.size, mean, float(((values - mean) ** 2).sum())))
+
+    def merge(self, other: "RunningMoments") -> None:
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+
+@dataclass(slots=True)
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch): every quantile is returned with a
+    relative error of at most `relative_accuracy`, memory grows with log(max/min)
+    and not with the number of values, and two sketches merge by adding counts.
+    """
+    relative_accuracy: float = 0.005
+    positive: dict = field(default_factory=dict)
+    negative: dict = field(default_factory=dict)
+    zeros: int = 0
+
+    @property
+    def _gamma(self) -> float:
+        return (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+
+    def _add(self, store: dict, values: np.ndarray) -> None:
+        keys, counts = np.unique(np.ceil(np.log(values) / math.log(self._gamma)), return_counts=True)
+        for k, c in zip(keys.astype(int).tolist(), counts.tolist()):
+            store[k] = store.get(k, 0) + c
+
+    def update(self, values: np.ndarray) -> None:
+        self._add(self.positive, values[values > 0])
+        self._add(self.negative, -values[values < 0])
+        self.zeros += int(np.count_nonzero(values == 0))
+
+    def merge(self, other: "QuantileSketch") -> None:
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for k, c in theirs.items():
+                mine[k] = mine.get(k, 0) + c
+        self.zeros += other.zeros
+
+    def quantile(self, q: float) -> float:
+        total = sum(self.positive.values()) + sum(self.negative.values()) + self.zeros
+        if not total:
+            return math.nan
+        gamma = self._gamma
+        rank = q * (total - 1)
+        seen = 0
+        # from the most negative value upwards
+        for k in sorted(self.negative, reverse=True):
+            seen += self.negative[k]
+            if seen > rank:
+                return -2 * gamma ** k / (gamma + 1)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for k in sorted(self.positive):
+            seen += self.positive[k]
+            if seen > rank:
+                return 2 * gamma ** k / (gamma + 1)
+        return 2 * gamma ** max(self.positive) / (gamma + 1)
+
+
+@dataclass(slots=True)
+class _ChunkSummary:
+    profit: RunningMoments = field(default_factory=RunningMoments)
+    profit_sketch: QuantileSketch = field(default_factory=QuantileSketch)
+    losses: int = 0
+    break_even: RunningMoments = field(default_factory=RunningMoments)
+    break_even_impossible: int = 0
+
+    def merge(self, other: "_ChunkSummary") -> None:
+        self.profit.merge(other.profit)
+        self.profit_sketch.merge(other.profit_sketch)
+        self.losses += other.losses
+        self.break_even.merge(other.break_even)
+        self.break_even_impossible += other.break_even_impossible
+
+
+# Simulation ---------------------------------------------------------------
+
+@dataclass(frozen=True, slots=True)
+class MonteCarloResult:
+    draws: int
+    mean_profit: float
+    std_profit: float
+    quantiles: dict
+    prob_loss: float
+    expected_break_even: float
+    prob_break_even_impossible: float
+
+
+def _simulate_chunk(base: TrofeoAmicizia, distributions: dict, seed: np.random.SeedSequence,
+                    size: int, relative_accuracy: float) -> _ChunkSummary:
+    rng = np.random.default_rng(seed)
+    draws = {name: dist.sample(rng, size) for name, dist in distributions.items()}
+    if "participants" in draws:
+        # the model needs at least 2 participants
+        draws["participants"] = np.maximum(np.rint(draws["participants"]), 2).astype(np.int64)
+    batch = TrofeoAmiciziaBatch.from_base(base, **draws)
+    profit = np.broadcast_to(batch.profit, batch.shape)
+    break_even = np.broadcast_to(batch.break_even_participants(), batch.shape)
+    finite = np.isfinite(break_even)
+
+    summary = _ChunkSummary(profit_sketch=QuantileSketch(relative_accuracy))
+    summary.profit.update(profit)
+    summary.profit_sketch.update(profit)
+    summary.losses = int(np.count_nonzero(profit < 0))
+    summary.break_even.update(break_even[finite])
+    summary.break_even_impossible = int(size - np.count_nonzero(finite))
+    return summary
+
+
+def simulate_profit(base: TrofeoAmicizia, distributions: dict, *, draws: int = 1_000_000,
+                    chunk_size: int = 500_000, seed: int | None = None,
+                    quantiles=(0.05, 0.25, 0.5, 0.75, 0.95), workers: int | None = None,
+                    relative_accuracy: float = 0.005) -> MonteCarloResult:
+    """
+    Simulazione Monte Carlo dell'utile: i campi in `distributions` (nome campo → distribuzione)
+    vengono estratti a caso, tutti gli altri restano quelli di `base`.
+
+    Le estrazioni sono elaborate a blocchi di `chunk_size`, quindi la memoria resta limitata
+    anche con decine di milioni di estrazioni; ogni blocco ha il suo seed derivato da `seed`,
+    perciò il risultato è riproducibile e non dipende da `workers` (numero di processi;
+    None o 1 ⇒ tutto nel processo corrente, 0 ⇒ tutti i core).
+    I quantili hanno un errore relativo di al più `relative_accuracy`.
+    """
+    unknown = set(distributions) - set(TrofeoAmicizia.__dataclass_fields__)
+    if unknown:
+        raise TypeError(f"unknown TrofeoAmicizia fields: {sorted(unknown)}")
+    sizes = [chunk_size] * (draws // chunk_size) + ([draws % chunk_size] if draws % chunk_size else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = ([base] * len(sizes), [distributions] * len(sizes), seeds, sizes, [relative_accuracy] * len(sizes))
+
+    total = _ChunkSummary(profit_sketch=QuantileSketch(relative_accuracy))
+    if workers in (None, 1):
+        for summary in map(_simulate_chunk, *args):
+            total.merge(summary)
+    else:
+        with ProcessPoolExecutor(max_workers=workers or None) as pool:
+            for summary in pool.map(_simulate_chunk, *args):
+                total.merge(summary)
+
+    return MonteCarloResult(
+        draws=draws,
+        mean_profit=total.profit.mean,
+        std_profit=math.sqrt(total.profit.variance),
+        quantiles={q: total.profit_sketch.quantile(q) for q in quantiles},
+        prob_loss=total.losses / draws if draws else math.nan,
+        expected_break_even=total.break_even.mean if total.break_even.count else math.inf,
+        prob_break_even_impossible=total.break_even_impossible / draws if draws else math.nan,
+    )
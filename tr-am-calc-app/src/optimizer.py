@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.batch import TrofeoAmiciziaBatch
+from src.model import TrofeoAmicizia
+from src.schedule import RoundCounts
+
+# Fields that make up the award spend and can be searched by `optimize_plan`.
+AWARD_FIELDS = (
+    "participation_medal_price",
+    "gadget_price",
+    "average_podium_medal_price",
+    "average_cup_price",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class LinearDemand:
+    """
+    Participants as a function of the registration price: `participants` at `price`,
+    `slope` athletes lost for every extra € (never fewer than 2).
+    """
+    participants: int
+    price: float
+    slope: float
+
+    def __call__(self, prices: np.ndarray) -> np.ndarray:
+        n = np.rint(self.participants - self.slope * (np.asarray(prices) - self.price))
+        return np.maximum(n, 2).astype(np.int64)
+
+
+@dataclass(frozen=True, slots=True)
+class PlanConstraints:
+    max_price: float
+    min_price: float = 0.0
+    price_step: float = 0.5
+    min_margin: float | None = None          # profit / revenue, 0–1 scale
+    # same for every round or {round: minimum}; None (and the rounds missing from the dict)
+    # keeps the coaches of the base event's schedule, so a plan never drops below it unasked
+    min_coaches_for_round: int | dict | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class OptimalPlan:
+    evento: TrofeoAmicizia
+    profit: float
+    margin: float
+    evaluated: int   # number of candidate plans evaluated
+
+
+def _minimum(base: TrofeoAmicizia, constraints: PlanConstraints, round_) -> int:
+    minimum = constraints.min_coaches_for_round
+    if isinstance(minimum, dict):
+        minimum = minimum.get(round_)
+    return base.coaches_for_round.get(round_, 0) if minimum is None else minimum
+
+
+def _coaches_plan(base: TrofeoAmicizia, constraints: PlanConstraints) -> dict:
+    """
+    Coaches per round. Both the profit and the margin fall as coaches are added (when the
+    salary is ≥0), so the best allocation is the smallest allowed one, in closed form.
+    """
+    plan = {}
+    for round_ in base.coaches_for_round:
+        low = _minimum(base, constraints, round_)
+        if low > base.available_coaches:
+            raise ValueError(f"{round_}: {low} coaches required, only {base.available_coaches} available")
+        plan[round_] = low if base.coaches_salary_for_round >= 0 else base.available_coaches
+    return plan
+
+
+def _minimum_counts(base: TrofeoAmicizia, rounds: tuple, constraints: PlanConstraints) -> np.ndarray:
+    return np.array([_minimum(base, constraints, r) for r in rounds])
+
+
+def optimize_plan(base: TrofeoAmicizia, constraints: PlanConstraints, *, demand=None,
+                  award_options: dict | None = None, schedules: RoundCounts | None = None) -> OptimalPlan:
+    """
+    Cerca il piano con l'utile massimo: prezzo d'iscrizione (griglia da `min_price` a
+    `max_price` con passo `price_step`), allenatori per turno (tra il minimo richiesto, di
+    default quelli di `base`, e `available_coaches`) e spesa per i premi (`award_options`: campo → valori possibili).
+
+    `demand` (es. `LinearDemand`) restituisce gli iscritti per un array di prezzi; se manca
+    gli iscritti restano quelli di `base`. `schedules` (un `RoundCounts` con `counts` di forma
+    (candidati, turni), eventualmente con stipendi per turno) sostituisce l'allocazione
+    minima degli allenatori con un insieme di turnazioni candidate.
+    Tutte le combinazioni sono valutate insieme con `TrofeoAmiciziaBatch`, quindi il
+    risultato è l'ottimo esatto sulla griglia. Solleva ValueError se nessun piano rispetta
+    i vincoli.
+    """
+    award_options = award_options or {}
+    unknown = set(award_options) - set(AWARD_FIELDS)
+    if unknown:
+        raise ValueError(f"not award fields: {sorted(unknown)}, use {AWARD_FIELDS}")
+
+    prices = np.arange(constraints.min_price, constraints.max_price + constraints.price_step / 2,
+                       constraints.price_step)
+    prices = prices[prices <= constraints.max_price]
+    ndim = 1 + len(award_options) + (schedules is not None)
+    # one axis for the price, one for every award field and one for the candidate schedules
+    grid = {"participation_price": prices.reshape((-1,) + (1,) * (ndim - 1))}
+    for axis, (name, values) in enumerate(award_options.items(), start=1):
+        shape = [1] * ndim
+        shape[axis] = -1
+        grid[name] = np.asarray(values, dtype=float).reshape(shape)
+    if demand is not None:
+        grid["participants"] = demand(grid["participation_price"])
+
+    if schedules is None:
+        coaches = _coaches_plan(base, constraints)
+    else:
+        counts = schedules.counts.reshape((1,) * (ndim - 1) + schedules.counts.shape)
+        coaches = RoundCounts(schedules.rounds, counts, schedules.salaries)
+    batch = TrofeoAmiciziaBatch.from_base(base, coaches_for_round=coaches, **grid)
+    profit = np.broadcast_to(batch.profit, batch.shape)
+    feasible = np.ones(batch.shape, dtype=bool)
+    if schedules is not None:
+        feasible &= batch.rounds_over_capacity == 0
+        feasible &= np.all(coaches.counts >= _minimum_counts(base, schedules.rounds, constraints), axis=-1)
+    if constraints.min_margin is not None:
+        feasible &= batch.profit_margin_pct() >= constraints.min_margin
+    if not feasible.any():
+        raise ValueError("no plan satisfies the constraints")
+
+    best = np.unravel_index(np.argmax(np.where(feasible, profit, -np.inf)), batch.shape)
+    changes = {name: np.broadcast_to(values, batch.shape)[best].item() for name, values in grid.items()}
+    if schedules is not None:
+        coaches = RoundCounts(schedules.rounds, schedules.counts[best[-1]], schedules.salaries)
+    evento = base.replace(coaches_for_round=coaches, **changes)
+    return OptimalPlan(
+        evento=evento,
+        profit=evento.profit,
+        margin=evento.profit_margin_pct(),
+        evaluated=profit.size,
+    )
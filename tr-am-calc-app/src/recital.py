@@ -1,8 +1,13 @@
 from dataclasses import dataclass
 
+import numpy as np
+
+from src.cache import derived
+from src.event_model import EventModel
+
 
 @dataclass(frozen=True, slots=True)
-class Recital:
+class Recital(EventModel):
     gymnasts: int
     spectators_per_gymnast: float
     ticket_price: float
@@ -11,16 +16,41 @@ class Recital:
     coaches_salary: int
 
     def __post_init__(self):
-        if self.gymnasts <= 1:
+        if np.any(np.asarray(self.gymnasts) <= 1):
             raise ValueError("gymnasts must be > 0")
 
     @property
+    def name(self) -> str:
+        return "Saggio"
+
+    # Income
+    @property
+    @derived("spectators_per_gymnast", "gymnasts")
     def tot_spectators(self) -> float:
         return self.spectators_per_gymnast * self.gymnasts
 
     @property
+    @derived("tot_spectators", "ticket_price")
     def tot_tickets_sold(self) -> float:
         return self.tot_spectators * self.ticket_price
 
+    @property
+    @derived("tot_tickets_sold")
+    def revenue(self) -> float:
+        return self.tot_tickets_sold
+
+    # Costs
+    @derived("coaches", "coaches_salary")
     def tot_coaches_cost(self) -> float:
-        return self.coaches * self.coaches_salary
\ No newline at end of file
+        return self.coaches * self.coaches_salary
+
+    @property
+    @derived("one_drive_transportation_cost")
+    def transportation_cost(self) -> float:
+        # andata e ritorno
+        return self.one_drive_transportation_cost * 2
+
+    @property
+    @derived("tot_coaches_cost", "transportation_cost")
+    def total_costs(self) -> float:
+        return self.tot_coaches_cost() + self.transportation_cost
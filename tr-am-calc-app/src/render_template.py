@@ -1,57 +1,272 @@
-import base64, datetime, io, pathlib
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-from weasyprint import HTML
+import base64, datetime, functools, hashlib, io, json, pathlib, threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import fields
 
+from src.instrument import instrumented, profiler
 from src.model import TrofeoAmicizia
+from src.schedule import RoundCounts
+from src.tiers import Tiers
 
 TEMPLATE_DIR = pathlib.Path(__file__).parent.parent / "templates"
 
-env = Environment(
-    loader=FileSystemLoader(TEMPLATE_DIR),
-    autoescape=select_autoescape()
-)
+# reports already rendered, keyed by the hash of their inputs (most recent last)
+REPORT_CACHE_SIZE = 32
+_report_cache: OrderedDict[str, tuple[bytes, str]] = OrderedDict()
+_pending: dict[str, Future] = {}
+# rendered charts (base64), keyed by `chart_key`
+CHART_CACHE_SIZE = 64
+CHART_MIME = {"png": "image/png", "svg": "image/svg+xml"}
+_chart_cache: OrderedDict[str, str] = OrderedDict()
+_lock = threading.Lock()
+# one background renderer: WeasyPrint and kaleido are not meant to run concurrently
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report")
 
-def render_chart(chart) -> str:
-    try:
-        # Plotly: best way is fig.to_image (needs kaleido)
-        png_bytes = chart.to_image(format="png", scale=2)
-    except AttributeError:
-        # Older Plotly or Matplotlib object without to_image
-        buf = io.BytesIO()
-        try:
-            # Plotly figures have write_image (kaleido backend)
-            chart.write_image(buf, format="png")  # Plotly with write_image
-            png_bytes = buf.getvalue()
-        except Exception:
-            # Fallback: assume Matplotlib
-            chart.savefig(buf, format="png", dpi=150, bbox_inches="tight")
-            png_bytes = buf.getvalue()
-
-    return base64.b64encode(png_bytes).decode()
-
-def build_trofeo_amicizia_report(event: TrofeoAmicizia, tornado_fig, *, inputs: dict, primary_kpi: dict, secondary_kpi:dict, rounds) -> tuple[bytes, str]:
-    """renders HTML->PDF and returns the PDF in bytes."""
-    # convert Plotly (needs kaleido) *or* Matplotlib figure to PNG in‑memory
-    # --- convert figure to PNG base64 -----------------------------------
-    tornado_b64 = render_chart(tornado_fig)
 
+@functools.cache
+def _logo_b64() -> str:
     logo_path = TEMPLATE_DIR / "vigna-pia-nuovo-logo.png"
-    logo_b64 = base64.b64encode(logo_path.read_bytes()).decode()
-
-    tpl = env.get_template("report_trofeo_am.html")
-    html_string = tpl.render(
-        event_name=event.name,
-        rounds=rounds,
-        coaches_round = event.coaches_for_round,
-        judges_round  = event.judges_for_round,
-        today=datetime.date.today().strftime("%d/%m/%Y"),
-        tornado_b64=tornado_b64,
-        logo_b64=logo_b64,
-
-        inputs=inputs,
-        primary_kpi=primary_kpi,
-        secondary_kpi=secondary_kpi,
+    return base64.b64encode(logo_path.read_bytes()).decode()
+
+
+# Jinja and WeasyPrint (with its cairo/pango stack) are imported on the first report,
+# so importing this module, e.g. from streamlit_app.py, stays cheap
+@functools.cache
+def _report_template():
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=select_autoescape()
     )
+    return env.get_template("report_trofeo_am.html")
+
+@functools.cache
+def warm_chart_renderer() -> None:
+    """
+    Starts kaleido once per process. With kaleido ≥1 a Chrome instance stays alive and
+    serves every `to_image` call (otherwise each call launches its own browser); older
+    kaleido versions already keep their subprocess between calls.
+    """
+    try:
+        import kaleido
+    except ImportError:
+        return
+    if not hasattr(kaleido, "start_sync_server"):
+        return
+    # without Chrome the server thread dies and every call would hang: leave the one-shot
+    # calls, which raise kaleido's "install Chrome" error. `find_browser` is choreographer's
+    # private API: if it moves, the one-shot calls are the safe fallback too
+    try:
+        from choreographer.browsers.chromium import Chromium
+        has_chrome = Chromium.find_browser(skip_local=False)
+    except (ImportError, AttributeError):
+        return
+    if has_chrome:
+        kaleido.start_sync_server(silence_warnings=True)  # stopped by kaleido at exit
+
+
+def prewarm_chart_renderer() -> Future:
+    """`warm_chart_renderer` in the report thread, so the first report does not wait for it."""
+    return _executor.submit(warm_chart_renderer)
+
+
+def chart_key(chart, format: str = "png", scale: float = 2) -> str | None:
+    """SHA-256 of the figure JSON and the output options; None for non-Plotly figures."""
+    to_json = getattr(chart, "to_json", None)
+    if to_json is None:
+        return None
+    return hashlib.sha256(f"{format}:{scale}:{to_json()}".encode()).hexdigest()
+
+
+@instrumented()
+def render_chart(chart, format: str = "png") -> str:
+    """
+    Base64 of the chart as `format` ("png", or "svg" to keep it vectorial in the PDF).
+    Plotly figures are rendered by the warm kaleido and cached by `chart_key`;
+    Matplotlib figures are saved with `savefig`. Anything else is a TypeError.
+    """
+    if format not in CHART_MIME:
+        raise ValueError(f"unsupported chart format {format!r}, use one of {sorted(CHART_MIME)}")
+    scale = 2 if format == "png" else 1
+    key = chart_key(chart, format, scale)
+    if key is not None:
+        with _lock:
+            if key in _chart_cache:
+                _chart_cache.move_to_end(key)
+                return _chart_cache[key]
+        warm_chart_renderer()
+        with profiler.stage("render_chart.kaleido"):
+            image = chart.to_image(format=format, scale=scale)
+    elif hasattr(chart, "savefig"):
+        buf = io.BytesIO()
+        with profiler.stage("render_chart.matplotlib"):
+            chart.savefig(buf, format=format, dpi=150, bbox_inches="tight")
+        image = buf.getvalue()
+    else:
+        raise TypeError(f"cannot render {type(chart).__name__}: expected a Plotly or Matplotlib figure")
+
+    encoded = base64.b64encode(image).decode()
+    if key is not None:
+        with _lock:
+            _chart_cache[key] = encoded
+            while len(_chart_cache) > CHART_CACHE_SIZE:
+                _chart_cache.popitem(last=False)
+    return encoded
+
+def trofeo_amicizia_report_sections(evento: TrofeoAmicizia, judges: int | None = None) -> dict:
+    """
+    Tables of the report (`inputs`, `primary_kpi`, `secondary_kpi`, `rounds`), ready to be
+    passed as keyword arguments to `build_trofeo_amicizia_report`.
+    `judges` defaults to the largest number of external judges in a round.
+    """
+    if judges is None:
+        judges = max(evento.judges_for_round.values(), default=0)
+    inputs = {
+        "Partecipanti": evento.participants,
+        "Prezzo iscrizione (€)": evento.participation_price,
+        "Costo medaglia partecipazione (€)": evento.participation_medal_price,
+        "Costo gadget (€)": evento.gadget_price,
+        "Categorie": evento.categories,
+        "Podii di specialità": evento.podiums_for_speciality_each_category,
+        "Prezzo medaglia podio (€)": evento.average_podium_medal_price,
+        "Prezzo coppa (€)": evento.average_cup_price,
+        "Allenatori disponibili": evento.available_coaches,
+        "Giudici esterni": judges,
+        "Costo allenatore / turno (€)": evento.coaches_salary_for_round,
+        "Costo giudice / turno (€)": evento.judges_salary_for_round,
+        "Costo cibo (€)": evento.food_cost,
+        "Foto per atleta": evento.photos_per_atlete,
+        "Profitto per foto (€)": evento.profit_per_photo,
+    }
+    for label, tiers in (("Sconti medaglie partecipazione", evento.participation_medal_tiers),
+                         ("Sconti gadget", evento.gadget_tiers), ("Sconti coppe", evento.cup_tiers),
+                         ("Sponsorship (€ / iscritto)", evento.sponsorship_tiers)):
+        if tiers is not None:
+            inputs[label] = "; ".join(f"oltre {start}: {rate:g}" for start, rate in tiers.to_dict().items())
+
+    primary_kpi = {
+        "Fatturato": f"{evento.revenue:,.2f} €",
+        "Costi totali": f"{evento.total_costs:,.2f} €",
+        "Utile": f"{evento.profit:,.2f} €",
+        "Profit margin": f"{evento.profit_margin_pct():.2%}",
+    }
+
+    secondary_kpi = {
+        "ΔProfit / atleta": f"{evento.dprofit_dparticipants():,.2f} €",
+        "Δ²Profit / atleta": f"{evento.d2profit_dparticipants2():,.2f} €",
+        "Break-even iscritti": evento.break_even_participants(),
+        "ARPP": f"{evento.average_revenue_per_participant():,.2f} €",
+        "CPP": f"{evento.cost_per_participant():,.2f} €",
+        "Margine di contribuzione / atleta": f"{evento.contribution_margin_per_participant():,.2f} €",
+        "Variable / Fixed ratio": f"{evento.variable_to_fixed_ratio():.2f}",
+        "Photo revenue ratio": f"{evento.photo_revenue_ratio():.2%}",
+    }
+
+    rounds = list(evento.rounds)   # es. ['turno1', 'turno2', …]
+    return dict(inputs=inputs, primary_kpi=primary_kpi, secondary_kpi=secondary_kpi, rounds=rounds)
+
+def render_trofeo_amicizia_html(event: TrofeoAmicizia, tornado_fig, *, inputs: dict, primary_kpi: dict, secondary_kpi:dict, rounds,
+                                chart_format: str = "png", sobol_fig=None) -> str:
+    """renders the HTML of the report (the charts are rendered here, see `render_chart`)."""
+    # --- convert figures to PNG (or SVG) base64 --------------------------
+    tornado_b64 = render_chart(tornado_fig, chart_format)
+    sobol_b64 = render_chart(sobol_fig, chart_format) if sobol_fig is not None else None
+
+    with profiler.stage("report.jinja"):
+        return _report_template().render(
+            event_name=event.name,
+            rounds=rounds,
+            coaches_round = event.coaches_for_round,
+            judges_round  = event.judges_for_round,
+            today=datetime.date.today().strftime("%d/%m/%Y"),
+            tornado_b64=tornado_b64,
+            tornado_mime=CHART_MIME[chart_format],
+            sobol_b64=sobol_b64,
+            logo_b64=_logo_b64(),
+
+            inputs=inputs,
+            primary_kpi=primary_kpi,
+            secondary_kpi=secondary_kpi,
+        )
+
+def build_trofeo_amicizia_report(event: TrofeoAmicizia, tornado_fig, *, inputs: dict, primary_kpi: dict, secondary_kpi:dict, rounds,
+                                 chart_format: str = "png", sobol_fig=None) -> tuple[bytes, str]:
+    """
+    renders HTML->PDF and returns the PDF in bytes.
+    With `chart_format="svg"` WeasyPrint draws the charts as vectors, with no rasterization.
+    `sobol_fig` (see `analysis.sobol_chart`) adds the global sensitivity after the tornado.
+    """
+    html_string = render_trofeo_amicizia_html(event, tornado_fig, inputs=inputs, primary_kpi=primary_kpi,
+                                              secondary_kpi=secondary_kpi, rounds=rounds,
+                                              chart_format=chart_format, sobol_fig=sobol_fig)
+    from weasyprint import HTML
+
+    with profiler.stage("report.write_pdf"):
+        pdf_bytes = HTML(string=html_string, base_url=".").write_pdf()
+    return pdf_bytes, html_string
+
+
+def report_key(event: TrofeoAmicizia, tornado_fig, *, inputs: dict, primary_kpi: dict, secondary_kpi: dict, rounds,
+               chart_format: str = "png", sobol_fig=None) -> str | None:
+    """
+    SHA-256 of everything that ends up in the report (today's date included).
+    None if a figure cannot be serialized (e.g. Matplotlib): such reports are not cached.
+    """
+    figures = [tornado_fig] + ([sobol_fig] if sobol_fig is not None else [])
+    if not all(hasattr(fig, "to_json") for fig in figures):
+        return None
+    payload = {
+        "event": {f.name: _json_field(getattr(event, f.name)) for f in fields(event) if f.init},
+        "tornado": tornado_fig.to_json(),
+        "sobol": sobol_fig.to_json() if sobol_fig is not None else None,
+        "inputs": inputs,
+        "primary_kpi": primary_kpi,
+        "secondary_kpi": secondary_kpi,
+        "rounds": list(rounds),
+        "chart_format": chart_format,
+        "today": datetime.date.today().isoformat(),
+    }
+    blob = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+def _json_field(value):
+    # round schedules and tier schedules by content, like the dicts they come from
+    return value.to_dict() if isinstance(value, RoundCounts | Tiers) else value
+
+
+def _render_and_store(key: str, *args, **kwargs) -> tuple[bytes, str]:
+    try:
+        result = build_trofeo_amicizia_report(*args, **kwargs)
+        with _lock:
+            _report_cache[key] = result
+            while len(_report_cache) > REPORT_CACHE_SIZE:
+                _report_cache.popitem(last=False)
+        return result
+    finally:
+        with _lock:
+            _pending.pop(key, None)
+
+
+def submit_trofeo_amicizia_report(event: TrofeoAmicizia, tornado_fig, **kwargs) -> Future:
+    """
+    Like `build_trofeo_amicizia_report`, but renders in a background thread and returns a
+    `Future` with `(pdf_bytes, html_string)`: poll it with `.done()`, wait with `.result()`
+    or `await asyncio.wrap_future(...)`.
 
-    pdf_bytes = HTML(string=html_string, base_url=".").write_pdf()
-    return pdf_bytes, html_string
\ No newline at end of file
+    Reports with the same inputs are rendered once: a cached report comes back as an
+    already completed future, a report still being rendered returns the same future.
+    """
+    key = report_key(event, tornado_fig, **kwargs)
+    if key is None:
+        return _executor.submit(build_trofeo_amicizia_report, event, tornado_fig, **kwargs)
+    with _lock:
+        if key in _report_cache:
+            _report_cache.move_to_end(key)
+            future = Future()
+            future.set_result(_report_cache[key])
+            return future
+        if key not in _pending:
+            _pending[key] = _executor.submit(_render_and_store, key, event, tornado_fig, **kwargs)
+        return _pending[key]
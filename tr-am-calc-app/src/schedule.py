@@ -0,0 +1,163 @@
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class RoundCounts(Mapping):
+    """
+    People of one role (coaches or judges) per round.
+
+    A single schedule keeps `counts` as a tuple of plain numbers, so one event is evaluated in
+    pure Python; a batch keeps an array where `counts[..., i]` is the count in round `rounds[i]`
+    and the leading axes are scenarios (thousands of candidate schedules evaluated at once).
+    `salaries`, if given, is a per-round salary that replaces the model's per-role salary.
+    Behaves like the `{round: count}` dict it replaces (`keys`, `values`, `get`, …):
+
+    >>> rc = RoundCounts.from_mapping({"turno1": 12, "turno2": 11})
+    >>> rc["turno2"], rc.get("turno9", 0), "turno9" in rc
+    (11, 0, False)
+
+    Equal schedules compare equal (and hash alike), also to the dict they come from.
+    With salaries the dict form is `{"counts": {round: count}, "salaries": {round: salary}}`.
+    """
+    rounds: tuple
+    counts: tuple | np.ndarray
+    salaries: tuple | np.ndarray | None = None
+    _index: dict = field(init=False, repr=False)   # round -> position on the last axis
+    _total: object = field(init=False, repr=False)  # Σ counts over the rounds, one per scenario
+
+    def __post_init__(self):
+        if isinstance(self.counts, tuple) and (self.salaries is None or np.ndim(self.salaries) == 1):
+            # a single schedule: plain Python numbers, no arrays
+            counts, salaries = self.counts, self.salaries
+            if salaries is not None:
+                salaries = tuple(np.asarray(salaries).tolist())
+            if len(counts) != len(self.rounds) or salaries is not None and len(salaries) != len(counts):
+                raise ValueError(f"counts must have one value for each of the {len(self.rounds)} rounds")
+            if min(counts, default=0) < 0:
+                raise ValueError("counts must be >= 0")
+            total = sum(counts)
+        else:
+            counts = np.asarray(self.counts)
+            salaries = None if self.salaries is None else np.asarray(self.salaries)
+            if counts.shape[-1:] != (len(self.rounds),):
+                raise ValueError(f"counts must end with one axis of {len(self.rounds)} rounds, got {counts.shape}")
+            if np.any(counts < 0):
+                raise ValueError("counts must be >= 0")
+            total = _unwrap(counts.sum(axis=-1))
+        object.__setattr__(self, "counts", counts)
+        object.__setattr__(self, "salaries", salaries)
+        object.__setattr__(self, "_index", dict(zip(self.rounds, range(len(self.rounds)))))
+        object.__setattr__(self, "_total", total)
+
+    @classmethod
+    def from_mapping(cls, rounds: Mapping) -> "RoundCounts":
+        """Adapter for the `{round: count}` dicts (counts may also be arrays of scenarios)."""
+        if isinstance(rounds, RoundCounts):
+            return rounds
+        if len(rounds) == 2 and isinstance(rounds.get("counts"), Mapping) and "salaries" in rounds:
+            # the `to_dict` form of a schedule with per-round salaries
+            counts = cls.from_mapping(rounds["counts"])
+            salaries = rounds["salaries"]
+            if not isinstance(salaries, Mapping) or salaries.keys() != counts._index.keys():
+                raise ValueError(f"salaries must have one value for each round, got {salaries}")
+            values = [salaries[r] for r in counts.rounds]
+            if not all(isinstance(v, int | float) for v in values):
+                values = np.stack(np.broadcast_arrays(*(np.asarray(v) for v in values)), axis=-1)
+            return cls(counts.rounds, counts.counts, tuple(values) if isinstance(values, list) else values)
+        if all(isinstance(v, int | float) for v in rounds.values()):
+            # a single schedule (the JSON dicts of the app): a tuple, no arrays
+            return cls(tuple(rounds), tuple(rounds.values()))
+        values = np.broadcast_arrays(*(np.asarray(v) for v in rounds.values()))
+        return cls(tuple(rounds), np.stack(values, axis=-1))
+
+    def to_dict(self) -> dict:
+        """The `{round: count}` dict (nested lists for a batch), with the salaries if any."""
+        counts = dict(zip(self.rounds, _columns(self.counts)))
+        if self.salaries is None:
+            return counts
+        return {"counts": counts, "salaries": dict(zip(self.rounds, _columns(self.salaries)))}
+
+    def __eq__(self, other):
+        if isinstance(other, Mapping) and not isinstance(other, RoundCounts):
+            try:
+                other = RoundCounts.from_mapping(other)
+            except ValueError:   # not a valid schedule
+                return False
+        if not isinstance(other, RoundCounts):
+            return NotImplemented
+        if self._index.keys() != other._index.keys():
+            return False
+        if (self.salaries is None) != (other.salaries is None):
+            return False
+        order = [other._index[r] for r in self.rounds]   # the same rounds, maybe in another order
+        return (_same(self.counts, other.counts, order)
+                and (self.salaries is None or _same(self.salaries, other.salaries, order)))
+
+    def __hash__(self):
+        counts = self.counts
+        if isinstance(counts, np.ndarray):
+            # 1-D arrays hash like the tuple of their numbers, so they match an equal single schedule
+            counts = counts.tolist() if counts.ndim == 1 else [counts[..., i].tobytes() for i in range(len(self.rounds))]
+        return hash(frozenset(zip(self.rounds, counts)))
+
+    # Mapping interface
+    def __getitem__(self, round_):
+        try:
+            i = self._index[round_]
+        except KeyError:
+            raise KeyError(round_) from None
+        if isinstance(self.counts, tuple):
+            return self.counts[i]
+        return _unwrap(self.counts[..., i][()])
+
+    def __iter__(self):
+        return iter(self.rounds)
+
+    def __len__(self) -> int:
+        return len(self.rounds)
+
+    # Vectorized evaluation
+    def cost(self, salary) -> np.ndarray:
+        """Σ counts × salary over the rounds, one value per scenario."""
+        if isinstance(self.salaries, tuple):
+            return sum(c * s for c, s in zip(self.counts, self.salaries))
+        if self.salaries is not None:
+            return _unwrap((self.counts * self.salaries).sum(axis=-1))
+        # per-role salary, the same in every round (a number, an array of scenarios or a Dual);
+        # with a single schedule `_total` is a plain number, so one event is evaluated in pure Python
+        return self._total * salary
+
+    @property
+    def peak(self) -> np.ndarray:
+        """Largest count over the rounds (0 with no rounds)."""
+        if isinstance(self.counts, tuple):
+            return max(self.counts, default=0)
+        return _unwrap(self.counts.max(axis=-1, initial=0))
+
+    def rounds_over(self, available) -> np.ndarray:
+        """Number of rounds that need more people than `available`."""
+        if isinstance(self.counts, tuple) and isinstance(available, int | float):
+            return sum(c > available for c in self.counts)
+        return _unwrap((np.asarray(self.counts) > np.expand_dims(np.asarray(available), -1)).sum(axis=-1))
+
+
+def _unwrap(value):
+    # a single schedule gives plain Python numbers, like the dict sums it replaces
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _columns(values) -> list:
+    """The value of every round: numbers for a single schedule, nested lists for a batch."""
+    if isinstance(values, tuple):
+        return list(values)
+    return [values[..., i].tolist() for i in range(values.shape[-1])]
+
+
+def _same(a, b, order) -> bool:
+    """`a` equals `b` with its rounds taken in `order`."""
+    if isinstance(a, tuple) and isinstance(b, tuple):
+        return a == tuple(b[i] for i in order)
+    return np.array_equal(np.asarray(a), np.asarray(b)[..., order])
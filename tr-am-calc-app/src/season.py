@@ -0,0 +1,115 @@
+"""
+Pianificazione della stagione: più eventi (edizioni del Trofeo, saggi, …) che condividono
+allenatori e budget, valutati insieme e confrontati fra piani alternativi.
+
+    plans = [SeasonPlan("A", (SeasonEvent(trofeo, date(2026, 5, 10), revenue_days=-30),
+                              SeasonEvent(saggio, date(2026, 6, 7)))), …]
+    ranking = rank_plans(plans, SeasonResources(coaches=14, budget=2000), workers=0)
+"""
+import datetime, math, os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from src.event_model import EventModel
+from src.model import TrofeoAmicizia
+from src.recital import Recital
+from src.schedule import RoundCounts
+
+# coaches an event needs on its date, by model class
+COACHES_NEEDED = {
+    TrofeoAmicizia: lambda event: RoundCounts.from_mapping(event.coaches_for_round).peak,
+    Recital: lambda event: event.coaches,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class SeasonEvent:
+    event: EventModel
+    date: datetime.date
+    revenue_days: int = 0   # when the revenue is cashed, relative to `date` (<0: in advance)
+    cost_days: int = 0      # when the costs are paid, relative to `date`
+
+
+@dataclass(frozen=True, slots=True)
+class SeasonPlan:
+    name: str
+    events: tuple[SeasonEvent, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class SeasonResources:
+    coaches: int                  # coaches available on any date
+    budget: float = math.inf      # largest cash advance the club can cover
+
+
+@dataclass(frozen=True, slots=True)
+class SeasonResult:
+    plan: str
+    profit: float
+    revenue: float
+    total_costs: float
+    cash_flow: tuple            # ((date, balance after the movements of that date), …)
+    funding_need: float         # largest negative balance, 0 if the season is always in credit
+    conflicts: tuple[str, ...]  # resources exceeded, empty for a feasible plan
+
+    @property
+    def feasible(self) -> bool:
+        return not self.conflicts
+
+
+def coaches_needed(event: EventModel) -> int:
+    try:
+        return COACHES_NEEDED[type(event)](event)
+    except KeyError:
+        raise TypeError(f"no coaches rule for {type(event).__name__}, add it to COACHES_NEEDED") from None
+
+
+def evaluate_plan(plan: SeasonPlan, resources: SeasonResources) -> SeasonResult:
+    """Profit, cash flow and resource conflicts of one season plan."""
+    movements: dict[datetime.date, float] = {}
+    coaches: dict[datetime.date, int] = {}
+    revenue = costs = 0.0
+    for item in plan.events:
+        values = item.event.evaluate(["revenue", "total_costs"])
+        revenue += values["revenue"]
+        costs += values["total_costs"]
+        cash_in = item.date + datetime.timedelta(days=item.revenue_days)
+        cash_out = item.date + datetime.timedelta(days=item.cost_days)
+        movements[cash_in] = movements.get(cash_in, 0.0) + values["revenue"]
+        movements[cash_out] = movements.get(cash_out, 0.0) - values["total_costs"]
+        coaches[item.date] = coaches.get(item.date, 0) + coaches_needed(item.event)
+
+    balance, cash_flow = 0.0, []
+    for day in sorted(movements):
+        balance += movements[day]
+        cash_flow.append((day, balance))
+    funding_need = max(0.0, -min((b for _, b in cash_flow), default=0.0))
+
+    conflicts = [f"{day}: {n} coaches needed, {resources.coaches} available"
+                 for day, n in sorted(coaches.items()) if n > resources.coaches]
+    if funding_need > resources.budget:
+        conflicts.append(f"cash advance of {funding_need:,.2f} over the budget of {resources.budget:,.2f}")
+    return SeasonResult(plan.name, revenue - costs, revenue, costs, tuple(cash_flow), funding_need, tuple(conflicts))
+
+
+def _evaluate_chunk(plans: list[SeasonPlan], resources: SeasonResources) -> list[SeasonResult]:
+    return [evaluate_plan(plan, resources) for plan in plans]
+
+
+def rank_plans(plans, resources: SeasonResources, *, workers: int | None = None,
+               chunk_size: int = 64) -> list[SeasonResult]:
+    """
+    Valuta tutti i piani e li ordina: prima quelli fattibili, poi per utile decrescente e,
+    a parità, per anticipo di cassa crescente.
+
+    `workers` come in `simulate_profit`: None o 1 in questo processo, 0 tutti i core;
+    i piani vanno ai processi in blocchi di `chunk_size`.
+    """
+    plans = list(plans)
+    chunks = [plans[i:i + chunk_size] for i in range(0, len(plans), chunk_size)]
+    if workers in (None, 1) or len(chunks) < 2:
+        results = [r for chunk in chunks for r in _evaluate_chunk(chunk, resources)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            results = [r for part in pool.map(_evaluate_chunk, chunks, [resources] * len(chunks)) for r in part]
+    return sorted(results, key=lambda r: (not r.feasible, -r.profit, r.funding_need))
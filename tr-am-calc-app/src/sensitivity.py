@@ -0,0 +1,165 @@
+import copy
+import math
+import numbers
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+
+@dataclass(frozen=True, slots=True)
+class Dual:
+    """
+    Forward-mode dual number `value + grad·ε` (ε² = 0).
+
+    Le property del modello sono solo somme e prodotti: sostituendo un campo con un Dual,
+    `grad` del risultato è la derivata esatta rispetto a quel campo. `value` e `grad` possono
+    essere float, array NumPy (più direzioni o più scenari insieme) o a loro volta Dual
+    (derivate seconde).
+    """
+    value: object
+    grad: object
+
+    # `array * dual` must call `Dual.__rmul__`, not build an object array of duals
+    __array_ufunc__ = None
+
+    def __add__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value + other.value, self.grad + other.grad)
+        return Dual(self.value + other, self.grad)
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return Dual(-self.value, -self.grad)
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __rsub__(self, other):
+        return (-self) + other
+
+    def __mul__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value * other.value, self.value * other.grad + self.grad * other.value)
+        return Dual(self.value * other, self.grad * other)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value / other.value,
+                        (self.grad * other.value - self.value * other.grad) / (other.value * other.value))
+        return Dual(self.value / other, self.grad / other)
+
+    def __rtruediv__(self, other):
+        return Dual(other / self.value, -other * self.grad / (self.value * self.value))
+
+
+def numeric_fields(instance) -> list[str]:
+    """Names of the fields that hold a number (per-round mappings and tier schedules excluded)."""
+    return [f.name for f in fields(instance)
+            if f.init and isinstance(getattr(instance, f.name), numbers.Number | np.ndarray)]
+
+
+def _with_duals(instance, duals: dict):
+    # the instance is already validated: set the duals (or any other value of the field)
+    # without running `__post_init__` again
+    clone = copy.copy(instance)
+    if hasattr(clone, "_cache"):
+        # the values cached so far are plain numbers, not duals
+        object.__setattr__(clone, "_cache", {})
+    for name, value in duals.items():
+        object.__setattr__(clone, name, value)
+    return clone
+
+
+def _evaluate(instance, output: str):
+    value = getattr(instance, output)
+    return value() if callable(value) else value
+
+
+def partial_derivative(instance, param: str, output: str = "profit"):
+    """Exact ∂output/∂param; works on scalar models and on batches of scenarios."""
+    result = _evaluate(_with_duals(instance, {param: Dual(getattr(instance, param), 1.0)}), output)
+    return result.grad if isinstance(result, Dual) else 0.0
+
+
+def second_partial_derivative(instance, param: str, output: str = "profit"):
+    """Exact ∂²output/∂param², with a dual number nested inside another."""
+    x = getattr(instance, param)
+    result = _evaluate(_with_duals(instance, {param: Dual(Dual(x, 1.0), Dual(1.0, 0.0))}), output)
+    return result.grad.grad if isinstance(result, Dual) and isinstance(result.grad, Dual) else 0.0
+
+
+def gradient(instance, output: str = "profit", params=None) -> dict[str, float]:
+    """
+    Tutte le derivate parziali di `output` (di default l'utile) rispetto ai campi numerici
+    in un solo passaggio: ogni campo riceve una direzione diversa della base canonica.
+    """
+    params = list(params) if params is not None else numeric_fields(instance)
+    directions = np.eye(len(params))
+    duals = {p: Dual(getattr(instance, p), directions[i]) for i, p in enumerate(params)}
+    result = _evaluate(_with_duals(instance, duals), output)
+    grad = result.grad if isinstance(result, Dual) else np.zeros(len(params))
+    return {p: float(g) for p, g in zip(params, grad)}
+
+
+def elasticities(instance, output: str = "profit", params=None) -> dict[str, float]:
+    """
+    Elasticità di `output` rispetto a ogni campo: variazione % dell'output per +1% del campo
+    (∂output/∂x · x / output); nan se l'output è zero.
+    """
+    base = _evaluate(instance, output)
+    return {
+        p: g * getattr(instance, p) / base if base else math.nan
+        for p, g in gradient(instance, output, params).items()
+    }
+
+
+def second_difference(instance, param: str, output: str = "profit"):
+    """
+    Δ²output = output(x+1) − 2·output(x) + output(x−1) of an output that is linear between
+    integer thresholds (see `linear_pieces`): the exact slope at x minus the one at x−1, which
+    is exactly 0 away from a threshold.
+    """
+    x = np.asarray(getattr(instance, param), dtype=float)
+    points = x + np.array([-1.0, 0.0]).reshape((2,) + (1,) * len(instance.shape))
+    result = _evaluate(_with_duals(instance, {param: Dual(points, 1.0)}), output)
+    grad = result.grad if isinstance(result, Dual) else 0.0
+    slopes = np.broadcast_to(grad, np.broadcast_shapes(points.shape, np.shape(grad)))
+    difference = slopes[1] - slopes[0]
+    return difference.item() if difference.ndim == 0 else difference
+
+
+@dataclass(frozen=True, slots=True)
+class Pieces:
+    lower: np.ndarray   # start of each piece along axis 0 (-inf for the first)
+    upper: np.ndarray   # end of each piece (inf for the last)
+    point: np.ndarray   # where each piece is evaluated
+    model: object       # clone of the model with `param` = Dual(point, 1)
+
+
+def linear_pieces(instance, param: str) -> Pieces:
+    """
+    I tratti in cui il modello è lineare in `param`, separati dalle soglie di
+    `instance.breakpoints(param)` (scaglioni di sconti e sponsorship, vedi `src.tiers`).
+
+    Sul modello restituito ogni output è un Dual con valore e pendenza esatti di ogni tratto
+    lungo un nuovo asse 0 (davanti a quelli di un eventuale batch): output(x) = valore +
+    pendenza · (x − point) vale per ogni x fra `lower` e `upper`. Senza soglie c'è un solo
+    tratto, valutato nel valore attuale di `param`.
+    """
+    x = np.asarray(getattr(instance, param), dtype=float)
+    cuts = np.asarray(instance.breakpoints(param), dtype=float)
+    if cuts.size:
+        # a point well inside every piece: at a threshold itself rounding could pick the wrong side
+        inner = (cuts[:-1] + cuts[1:]) / 2
+        points = np.concatenate(([cuts[0] - 1], inner, [cuts[-1] + 1]))
+    else:
+        points = np.array([np.nan])
+    lower = np.concatenate(([-np.inf], cuts))
+    upper = np.concatenate((cuts, [np.inf]))
+    shape = (len(lower),) + (1,) * len(instance.shape)
+    point = np.where(np.isnan(points.reshape(shape)), x, points.reshape(shape))
+    model = _with_duals(instance, {param: Dual(point, 1.0)})
+    return Pieces(lower.reshape(shape), upper.reshape(shape), point, model)
@@ -0,0 +1,350 @@
+"""
+Servizio HTTP/JSON senza interfaccia: utile, KPI e sensibilità di un `TrofeoAmicizia` o di un
+`Recital`, per gli altri strumenti della società (sito delle iscrizioni, fogli di calcolo, …).
+
+    python -m src.service --port 8600
+
+    POST /evaluate  {"model": "TrofeoAmicizia", "params": {...campi del modello...}, "sensitivity": true}
+    →   {"model": …, "profit": …, "revenue": …, "total_costs": …, "kpis": {...},
+         "sensitivity": {campo: {"derivative": ∂utile/∂campo, "elasticity": …}}}
+    GET  /health    →   {"status": "ok", "queued": …}
+
+Le richieste concorrenti finiscono in una coda limitata e vengono valutate a micro-batch:
+quelle dello stesso modello (con gli stessi turni e gli stessi scaglioni) diventano un solo batch vettoriale
+(`from_base`). A coda piena il servizio risponde subito 503 con `Retry-After`.
+I valori non finiti (es. `break_even_participants` irraggiungibile) sono `null`.
+"""
+import argparse, asyncio, json, logging, math, time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+
+import numpy as np
+import tornado.httpserver
+import tornado.netutil
+import tornado.web
+
+from src.event_model import EventModel
+from src.instrument import profiler
+from src.model import TrofeoAmicizia
+from src.recital import Recital
+from src.schedule import RoundCounts
+from src.sensitivity import numeric_fields, partial_derivative
+from src.tiers import Tiers
+
+logger = logging.getLogger("tr_am_calc.service")
+
+MODELS = {cls.__name__: cls for cls in (TrofeoAmicizia, Recital)}
+QUEUE_SIZE = 4096
+MAX_BATCH = 512
+MAX_DELAY = 0.002          # seconds the batcher waits for more requests after the first one
+MAX_BODY_SIZE = 64 * 1024
+
+
+def kpis(cls) -> list[str]:
+    """
+    The public KPI methods of a model (derived nodes called with no arguments), without
+    the intermediate figures of the profit (e.g. `Recital.tot_coaches_cost`).
+    """
+    intermediate = set(cls.plan(["profit"]))
+    return [name for name in cls.nodes()
+            if not name.startswith("_") and name not in intermediate
+            and not isinstance(getattr(cls, name), property)]
+
+
+@dataclass(frozen=True, slots=True)
+class Job:
+    instance: EventModel       # already validated by the model
+    sensitivity: bool
+    future: asyncio.Future
+
+
+def parse(payload) -> EventModel:
+    """The model of a request payload; ValueError with a readable message if it is not valid."""
+    if not isinstance(payload, dict):
+        raise ValueError("the body must be a JSON object")
+    try:
+        cls = MODELS[payload.get("model", "TrofeoAmicizia")]
+    except (KeyError, TypeError):
+        raise ValueError(f"unknown model {payload.get('model')!r}, use one of {sorted(MODELS)}") from None
+    params = payload.get("params")
+    if not isinstance(params, dict):
+        raise ValueError("'params' must be an object with the fields of the model")
+    # every request is validated here on its own: an invalid one is a 400 for its client,
+    # never an error for the whole micro-batch it would end up in
+    types = {f.name: f.type for f in fields(cls) if f.init}
+    for name, value in params.items():
+        if name not in types:           # reported by the model below
+            continue
+        if types[name] in (int, float):
+            if not _is_number(value):
+                raise ValueError(f"{name}: expected a finite number, got {value!r}")
+        elif isinstance(value, dict):   # per-round counts or a tier schedule
+            if not all(_is_number(v) for v in value.values()):
+                raise ValueError(f"{name}: the values of the mapping must be finite numbers")
+        elif value is not None:         # None: no tier schedule
+            raise ValueError(f"{name}: expected an object or null, got {value!r}")
+    try:
+        # the model checks the rest: counts >= 0, tiers starting at 0, participants > 1, …
+        return cls(**params)
+    except TypeError as e:   # missing or unknown fields
+        raise ValueError(str(e)) from None
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, int | float) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _batch_key(instance: EventModel) -> tuple:
+    # requests can share a batch only if their per-round fields have the same rounds
+    # (and per-round salaries) and their tier schedules are the same (schedules are not broadcast)
+    key = [type(instance)]
+    for f in fields(instance):
+        if not f.init:
+            continue
+        value = getattr(instance, f.name)
+        if isinstance(value, RoundCounts) and value.salaries is not None:
+            key.append((f.name, tuple(value), tuple(value.salaries)))
+        elif isinstance(value, dict | RoundCounts):
+            key.append((f.name, tuple(value)))
+        elif value is None or isinstance(value, Tiers):
+            key.append((f.name, value))
+    return tuple(key)
+
+
+def _stack(group: list[EventModel]) -> EventModel:
+    """One batch model whose element i is `group[i]`."""
+    first = group[0]
+    arrays = {}
+    for f in fields(first):
+        if not f.init:
+            continue
+        values = [getattr(instance, f.name) for instance in group]
+        if values[0] is None or isinstance(values[0], Tiers):
+            continue   # the same in the whole group, taken from `first`
+        if isinstance(values[0], RoundCounts):
+            rounds = values[0].rounds
+            counts = np.array([[v[r] for r in rounds] for v in values])
+            arrays[f.name] = RoundCounts(rounds, counts, values[0].salaries)   # the same salaries in the whole group
+        elif isinstance(values[0], dict):
+            arrays[f.name] = RoundCounts.from_mapping({r: np.array([v[r] for v in values]) for r in values[0]})
+        else:
+            arrays[f.name] = np.array(values)
+    return type(first).from_base(first, **arrays)
+
+
+def _number(value):
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def evaluate_group(group: list[EventModel], sensitivity: list[bool]) -> list[dict]:
+    """
+    Valuta in un solo passaggio vettoriale un gruppo di richieste dello stesso modello e con
+    gli stessi turni; la sensibilità (una derivata esatta per campo) solo se qualcuno la chiede.
+    """
+    cls = type(group[0])
+    names = kpis(cls)
+    batch = _stack(group)
+    values = batch.results(["profit", "revenue", "total_costs", *names])
+    derivatives = {}
+    if any(sensitivity):
+        derivatives = {p: np.broadcast_to(partial_derivative(batch, p), batch.shape)
+                       for p in numeric_fields(group[0])}
+
+    responses = []
+    for i, instance in enumerate(group):
+        response = {
+            "model": cls.__name__,
+            "profit": _number(values["profit"][i]),
+            "revenue": _number(values["revenue"][i]),
+            "total_costs": _number(values["total_costs"][i]),
+            "kpis": {name: _number(values[name][i]) for name in names},
+        }
+        if sensitivity[i]:
+            profit = values["profit"][i]
+            response["sensitivity"] = {
+                p: {
+                    "derivative": _number(d[i]),
+                    # % change of the profit for +1% of the field
+                    "elasticity": _number(d[i] * getattr(instance, p) / profit) if profit else None,
+                }
+                for p, d in derivatives.items()
+            }
+        responses.append(response)
+    return responses
+
+
+def evaluate_jobs(jobs: list[Job]) -> list:
+    """Responses (or the exception of their group) in the order of `jobs`."""
+    groups: dict[tuple, list[int]] = {}
+    for i, job in enumerate(jobs):
+        groups.setdefault(_batch_key(job.instance), []).append(i)
+    results = [None] * len(jobs)
+    for indices in groups.values():
+        try:
+            with profiler.stage("service.evaluate_group"):
+                responses = evaluate_group([jobs[i].instance for i in indices], [jobs[i].sensitivity for i in indices])
+        except Exception:   # noqa: BLE001
+            # one request the validation let through should not fail the others: one by one
+            logger.exception("batch evaluation failed, evaluating its %d requests one by one", len(indices))
+            responses = [_evaluate_one(jobs[i]) for i in indices]
+        for i, response in zip(indices, responses):
+            results[i] = response
+    return results
+
+
+def _evaluate_one(job: Job):
+    try:
+        return evaluate_group([job.instance], [job.sensitivity])[0]
+    except Exception as e:   # noqa: BLE001 - reported to this request only
+        return e
+
+
+class Batcher:
+    """
+    Coda limitata e un task che la svuota a micro-batch: aspetta la prima richiesta, poi al
+    massimo `max_delay` secondi (o `max_batch` richieste) e valuta tutto in un thread a parte,
+    così il loop continua ad accettare connessioni; intanto la coda si riempie del batch successivo.
+    """
+
+    def __init__(self, queue_size: int = QUEUE_SIZE, max_batch: int = MAX_BATCH, max_delay: float = MAX_DELAY):
+        self.queue: asyncio.Queue[Job] = asyncio.Queue(maxsize=queue_size)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="evaluate")
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        self._executor.shutdown(wait=False)
+
+    def submit(self, instance: EventModel, sensitivity: bool = False) -> asyncio.Future:
+        """Future of the response; raises asyncio.QueueFull when the queue is full."""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait(Job(instance, sensitivity, future))
+        return future
+
+    async def _collect(self) -> list[Job]:
+        jobs = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(jobs) < self.max_batch:
+            try:
+                jobs.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                jobs.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except TimeoutError:
+                break
+        return jobs
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = await self._collect()
+            results = await loop.run_in_executor(self._executor, evaluate_jobs, jobs)
+            for job, result in zip(jobs, results):
+                if job.future.done():   # the client went away
+                    continue
+                if isinstance(result, Exception):
+                    job.future.set_exception(result)
+                else:
+                    job.future.set_result(result)
+
+
+class JSONHandler(tornado.web.RequestHandler):
+    def write_json(self, status: int, body: dict) -> None:
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(body, allow_nan=False))
+
+    def write_error(self, status_code: int, **kwargs) -> None:
+        self.write_json(status_code, {"error": self._reason})
+
+
+class EvaluateHandler(JSONHandler):
+    def initialize(self, batcher: Batcher):
+        self.batcher = batcher
+
+    async def post(self):
+        try:
+            payload = json.loads(self.request.body)
+            instance = parse(payload)
+        except ValueError as e:   # also json.JSONDecodeError
+            return self.write_json(400, {"error": str(e)})
+        try:
+            future = self.batcher.submit(instance, bool(payload.get("sensitivity", False)))
+        except asyncio.QueueFull:
+            self.set_header("Retry-After", "1")
+            return self.write_json(503, {"error": "too many requests in the queue, retry later"})
+        try:
+            response = await future
+        except Exception as e:   # noqa: BLE001
+            return self.write_json(500, {"error": f"{type(e).__name__}: {e}"})
+        self.write_json(200, response)
+
+
+class HealthHandler(JSONHandler):
+    def initialize(self, batcher: Batcher):
+        self.batcher = batcher
+
+    def get(self):
+        self.write_json(200, {"status": "ok", "queued": self.batcher.queue.qsize(), "models": sorted(MODELS)})
+
+
+def _log_request(handler: tornado.web.RequestHandler) -> None:
+    # one access line per request would cost more than the evaluation: only the failures
+    status = handler.get_status()
+    if status >= 500 and status != 503:
+        logger.warning("%d %s %.1fms", status, handler._request_summary(), 1000 * handler.request.request_time())
+
+
+def make_app(batcher: Batcher) -> tornado.web.Application:
+    return tornado.web.Application([
+        (r"/evaluate", EvaluateHandler, {"batcher": batcher}),
+        (r"/health", HealthHandler, {"batcher": batcher}),
+    ], log_function=_log_request)
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8600, *, backlog: int = 4096, **batcher_options) -> None:
+    """Serves until cancelled; `backlog` lets thousands of clients connect at once."""
+    batcher = Batcher(**batcher_options)
+    batcher.start()
+    server = tornado.httpserver.HTTPServer(make_app(batcher), max_body_size=MAX_BODY_SIZE)
+    server.add_sockets(tornado.netutil.bind_sockets(port, host, backlog=backlog))
+    logger.info("listening on http://%s:%d", host, port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        server.stop()
+        await batcher.stop()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="richieste in attesa prima del 503")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-delay-ms", type=float, default=MAX_DELAY * 1000,
+                        help="attesa massima per riempire un micro-batch")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    try:
+        asyncio.run(serve(args.host, args.port, queue_size=args.queue_size, max_batch=args.max_batch,
+                          max_delay=args.max_delay_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
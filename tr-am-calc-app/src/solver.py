@@ -0,0 +1,100 @@
+"""
+Obiettivi in forma chiusa: quale valore di un parametro serve per il pareggio, per un utile
+o per un margine dati.
+
+L'utile e il fatturato sono lineari in ogni singolo parametro fra due soglie degli scaglioni
+(sconti quantità e sponsorship, `src.tiers`; senza scaglioni su tutta la retta), quindi in ogni
+tratto output(x) = output(x₀) + ∂output/∂x · (x − x₀) è esatto e l'obiettivo si risolve con una
+divisione: basta una derivata esatta per tratto (`linear_pieces`), che funziona anche su batch
+di scenari. Le curve di iso-utile sono lo stesso calcolo su un batch.
+"""
+import math
+
+import numpy as np
+
+from src.analysis import Surface
+from src.event_model import EventModel
+from src.sensitivity import Dual, linear_pieces
+
+# smallest valid value of the fields that are not simply ≥ 0
+LOWER_BOUNDS = {"participants": 2}
+
+
+def _target(model, profit, margin):
+    """Target function f = profit − target (or profit − margin·revenue), a Dual with ∂f/∂param."""
+    if margin is None:
+        return model.profit - profit
+    return model.profit - margin * model.revenue
+
+
+def _solve_pieces(instance: EventModel, param: str, profit, margin):
+    """
+    Root of the target in every linear piece of `param`; the one nearest to the current value
+    wins. Returns (root, slope there, target at the current value): where no piece has a
+    root the target has one sign everywhere, returned as slope 0.
+    """
+    x0 = np.asarray(getattr(instance, param), dtype=float)
+    pieces = linear_pieces(instance, param)
+    target = _target(pieces.model, profit, margin)
+    if not isinstance(target, Dual):   # `param` does not move the output
+        target = Dual(target, 0.0)
+    value, slope, point, lower, upper = np.broadcast_arrays(
+        np.asarray(target.value, dtype=float), np.asarray(target.grad, dtype=float),
+        pieces.point, pieces.lower, pieces.upper,
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        root = point - value / np.where(slope == 0, np.nan, slope)
+    # a root on a threshold may land a rounding error outside both pieces around it
+    valid = (root >= lower - 1e-9 * (1 + np.abs(lower))) & (root <= upper + 1e-9 * (1 + np.abs(upper)))
+    distance = np.where(valid, np.abs(root - x0), np.inf)
+    best = np.argmin(distance, axis=0)[None]
+    found = np.isfinite(np.take_along_axis(distance, best, 0)[0])
+    here = np.sum(x0 >= lower, axis=0, keepdims=True) - 1
+    current = np.take_along_axis(value + slope * (x0 - point), here, 0)[0]
+    return (np.where(found, np.take_along_axis(root, best, 0)[0], np.nan),
+            np.where(found, np.take_along_axis(slope, best, 0)[0], 0.0),
+            current)
+
+
+def required_value(instance: EventModel, param: str, *, profit: float = 0.0, margin: float | None = None):
+    """
+    Valore di `param` con cui l'evento raggiunge l'obiettivo, a parità degli altri campi:
+    utile = `profit` (default 0, il pareggio) oppure, se dato, margine = `margin` (0–1,
+    utile / fatturato). Funziona su un'istanza o su un batch (`from_base`), elemento per elemento.
+
+    - se l'output cresce con `param` l'obiettivo vale per ogni valore ≥ del risultato,
+      se decresce per ogni valore ≤ (con gli scaglioni: vicino al risultato; se l'obiettivo
+      si raggiunge in più punti, vale quello più vicino al valore attuale);
+    - per i campi interi (es. `participants`) il risultato è arrotondato verso il lato che
+      soddisfa l'obiettivo ed è un `int` (come `break_even_participants`; nei batch resta float);
+    - `math.inf` dove l'obiettivo è irraggiungibile: `param` non sposta l'output, oppure
+      servirebbe un valore sotto il minimo ammesso (0, o `LOWER_BOUNDS`).
+    """
+    x0 = np.asarray(getattr(instance, param), dtype=float)
+    x, slope, value = _solve_pieces(instance, param, profit, margin)
+    is_int = type(instance).__dataclass_fields__[param].type is int
+    if is_int:
+        x = np.where(slope > 0, np.ceil(x), np.floor(x))
+    # flat target: reached already (any value works, keep the current one) or never
+    x = np.where(slope == 0, np.where(value >= 0, x0, np.inf), x)
+    lower = LOWER_BOUNDS.get(param, 0)
+    # decreasing target: every value ≤ x works, but there is none when x is below the minimum
+    x = np.where((slope < 0) & (x < lower), np.inf, x)
+    # increasing target: the minimum itself is enough
+    x = np.where((slope > 0) & (x < lower), lower, x)
+    if x.ndim:
+        return x
+    return int(x) if is_int and math.isfinite(x) else x.item()
+
+
+def iso_curve(instance: EventModel, x: str, y: str, values, *, profit: float = 0.0,
+              margin: float | None = None) -> Surface:
+    """
+    Curva di iso-utile (o iso-margine): per ogni valore di `y` in `values`, il valore di `x`
+    che dà lo stesso obiettivo di `required_value`, es. il prezzo di pareggio per ogni
+    numero di iscritti. Calcolata in un solo passaggio vettoriale; `inf` dove irraggiungibile.
+    """
+    values = np.asarray(values)
+    batch = type(instance).from_base(instance, **{y: values})
+    needed = np.broadcast_to(required_value(batch, x, profit=profit, margin=margin), batch.shape)
+    return Surface((y,), {y: values}, needed, x)
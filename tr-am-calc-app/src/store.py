@@ -0,0 +1,178 @@
+import datetime, json, sqlite3
+from dataclasses import fields
+
+import numpy as np
+
+from src.batch import OUTPUTS, TrofeoAmiciziaBatch
+from src.model import ROUND_FIELDS, TIER_FIELDS, TrofeoAmicizia
+from src.recital import Recital
+from src.schedule import RoundCounts
+from src.tiers import Tiers
+
+MODELS = {cls.__name__: cls for cls in (TrofeoAmicizia, Recital)}
+
+# Numeric TrofeoAmicizia fields and public KPIs get their own column, so they can be queried.
+PARAM_COLUMNS = [f.name for f in fields(TrofeoAmicizia) if f.init and f.name not in ROUND_FIELDS + TIER_FIELDS]
+KPI_COLUMNS = [name for name in OUTPUTS if not name.startswith("_")]
+COLUMNS = ["kind", "name", "edition", "date", *PARAM_COLUMNS, *KPI_COLUMNS]
+
+OPERATORS = {"lt": "<", "le": "<=", "gt": ">", "ge": ">=", "eq": "=", "ne": "!="}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT,
+    edition TEXT,
+    date TEXT,
+    params TEXT NOT NULL,
+    {", ".join(f"{c} REAL" for c in PARAM_COLUMNS + KPI_COLUMNS)}
+);
+CREATE TABLE IF NOT EXISTS scenario_tags (
+    scenario_id INTEGER NOT NULL REFERENCES scenarios(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (tag, scenario_id)
+);
+CREATE INDEX IF NOT EXISTS scenarios_edition ON scenarios(edition);
+CREATE INDEX IF NOT EXISTS scenarios_date ON scenarios(date);
+CREATE INDEX IF NOT EXISTS scenario_tags_scenario ON scenario_tags(scenario_id);
+"""
+
+
+def _params(instance) -> dict:
+    """Fields without a column of their own, saved as JSON."""
+    columns = PARAM_COLUMNS if isinstance(instance, TrofeoAmicizia) else ()
+    params = {f.name: getattr(instance, f.name) for f in fields(instance) if f.init and f.name not in columns}
+    return {k: v.to_dict() if isinstance(v, RoundCounts | Tiers) else v for k, v in params.items()}
+
+
+class ScenarioStore:
+    """
+    Archivio SQLite di edizioni passate e piani candidati (`TrofeoAmicizia` e `Recital`).
+
+    Ogni scenario salva i parametri, edizione, data e tag; per `TrofeoAmicizia` i campi
+    numerici e i KPI hanno colonne proprie (il resto è in JSON), così si possono filtrare:
+
+        store = ScenarioStore("scenari.db")
+        store.find(profit__lt=0, participants__gt=200, tag="2025")
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _insert(self, rows: list[tuple], params: list[str], tags) -> list[int]:
+        placeholders = ", ".join("?" * (len(COLUMNS) + 1))
+        with self.conn:
+            # take the write lock before reading MAX(id): two writers must not pick the same ids
+            self.conn.execute("BEGIN IMMEDIATE")
+            cur = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM scenarios")
+            first = cur.fetchone()[0] + 1
+            ids = list(range(first, first + len(rows)))
+            self.conn.executemany(
+                f"INSERT INTO scenarios (id, params, {', '.join(COLUMNS)}) VALUES (?, {placeholders})",
+                ((i, p, *row) for i, p, row in zip(ids, params, rows)),
+            )
+            self.conn.executemany(
+                "INSERT INTO scenario_tags (scenario_id, tag) VALUES (?, ?)",
+                ((i, tag) for i in ids for tag in tags),
+            )
+        return ids
+
+    def add(self, instance, *, name: str | None = None, edition: str | None = None,
+            date: datetime.date | str | None = None, tags=()) -> int:
+        """Saves one scenario and returns its id."""
+        kind = type(instance).__name__
+        if kind not in MODELS:
+            raise TypeError(f"cannot store {kind}, only {sorted(MODELS)}")
+        values = {}
+        if isinstance(instance, TrofeoAmicizia):
+            values = {c: getattr(instance, c) for c in PARAM_COLUMNS}
+        # every model has at least revenue, total_costs and profit
+        values.update(instance.evaluate([c for c in KPI_COLUMNS if c in instance.nodes()]))
+        row = (kind, name, edition, str(date) if date else None, *(values.get(c) for c in COLUMNS[4:]))
+        return self._insert([row], [json.dumps(_params(instance))], tags)[0]
+
+    def add_batch(self, base: TrofeoAmicizia, data=None, *, name: str | None = None,
+                  edition: str | None = None, date: datetime.date | str | None = None,
+                  tags=(), **arrays) -> list[int]:
+        """
+        Saves every scenario of `evaluate_batch(base, data, **arrays)` in one transaction:
+        the KPIs are computed with one vectorized pass.
+        """
+        batch = TrofeoAmiciziaBatch.from_base(base, data, **arrays)
+        results = batch.results()
+        columns = [np.broadcast_to(getattr(batch, c), batch.shape).ravel() for c in PARAM_COLUMNS]
+        columns += [results[c].ravel() for c in KPI_COLUMNS]
+        params = json.dumps(_params(batch))
+        fixed = ("TrofeoAmicizia", name, edition, str(date) if date else None)
+        rows = [fixed + values for values in zip(*(c.tolist() for c in columns))]
+        return self._insert(rows, [params] * len(rows), tags)
+
+    def get(self, scenario_id: int):
+        """Rebuilds the model instance (the round dicts come back with string keys)."""
+        record = self.record(scenario_id)
+        return MODELS[record["kind"]](**record["params"])
+
+    def record(self, scenario_id: int) -> dict:
+        """Stored columns, parameters and tags of one scenario."""
+        cur = self.conn.execute(f"SELECT id, params, {', '.join(COLUMNS)} FROM scenarios WHERE id = ?",
+                                (scenario_id,))
+        row = cur.fetchone()
+        if row is None:
+            raise KeyError(scenario_id)
+        record = dict(zip(["id", "params", *COLUMNS], row))
+        params = json.loads(record["params"])
+        if record["kind"] == "TrofeoAmicizia":
+            for c in PARAM_COLUMNS:
+                value = record.pop(c)
+                params[c] = int(value) if TrofeoAmicizia.__dataclass_fields__[c].type is int else value
+        record["params"] = params
+        record["tags"] = sorted(t for (t,) in self.conn.execute(
+            "SELECT tag FROM scenario_tags WHERE scenario_id = ?", (scenario_id,)))
+        return record
+
+    def find(self, *, tag: str | None = None, limit: int | None = None, **conditions) -> list[int]:
+        """
+        Ids of the scenarios that match every condition: `column=value` or
+        `column__op=value` with op in lt, le, gt, ge, eq, ne (e.g. `profit__lt=0`).
+        """
+        where, args = [], []
+        for key, value in conditions.items():
+            column, _, op = key.partition("__")
+            if column not in COLUMNS:
+                raise ValueError(f"unknown column {column!r}")
+            if op and op not in OPERATORS:
+                raise ValueError(f"unknown operator {op!r}, use one of {sorted(OPERATORS)}")
+            where.append(f"{column} {OPERATORS[op or 'eq']} ?")
+            args.append(str(value) if isinstance(value, datetime.date) else value)
+        if tag is not None:
+            where.append("EXISTS (SELECT 1 FROM scenario_tags t WHERE t.scenario_id = scenarios.id AND t.tag = ?)")
+            args.append(tag)
+        sql = "SELECT id FROM scenarios"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [i for (i,) in self.conn.execute(sql, args)]
+
+    def diff(self, a: int, b: int) -> dict:
+        """Fields (parameters, KPIs, metadata, tags) that differ: {field: (value in a, value in b)}."""
+        ra, rb = self.record(a), self.record(b)
+        params_a, params_b = ra.pop("params"), rb.pop("params")
+        ra.pop("id"), rb.pop("id")
+        changes = {}
+        for source_a, source_b in ((params_a, params_b), (ra, rb)):
+            for key in dict.fromkeys([*source_a, *source_b]):
+                if key in changes:
+                    continue
+                va, vb = source_a.get(key), source_b.get(key)
+                if va != vb:
+                    changes[key] = (va, vb)
+        return changes
@@ -0,0 +1,104 @@
+"""
+Listini a scaglioni: sconti quantità (medaglie, gadget, coppe) e sponsorship pagate in base
+al numero di partecipanti.
+
+Uno scaglione vale per le unità oltre la sua soglia (come gli scaglioni IRPEF): con
+
+    Tiers.from_mapping({0: 1.0, 100: 0.9, 300: 0.8})
+
+le prime 100 unità costano il prezzo pieno, dalla 101ª alla 300ª il 90%, oltre l'80%.
+Il totale è quindi continuo e lineare fra due soglie; i totali cumulati alle soglie sono
+calcolati una volta, così ogni valore costa una ricerca binaria (`np.searchsorted`) anche su
+un batch di scenari, e con un `Dual` la derivata è esatta (la tariffa dello scaglione).
+"""
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from src.sensitivity import Dual
+
+
+def _primal(value):
+    """The plain number (or array) inside a possibly nested Dual."""
+    while isinstance(value, Dual):
+        value = value.value
+    return value
+
+
+def _number(value: float):
+    return int(value) if float(value).is_integer() else float(value)
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class Tiers:
+    """
+    Graduated schedule: `rates[i]` per unit from `starts[i]` up to `starts[i + 1]`.
+
+    `starts` is sorted and begins at 0; `cumulative[i]` is the total of the first
+    `starts[i]` units. Equal schedules compare equal (and hash alike), whatever their arrays.
+    """
+    starts: np.ndarray
+    rates: np.ndarray
+    cumulative: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self):
+        starts = np.asarray(self.starts, dtype=float)
+        rates = np.asarray(self.rates, dtype=float)
+        if starts.ndim != 1 or starts.shape != rates.shape or not starts.size:
+            raise ValueError("starts and rates must be two 1-D arrays of the same non-zero length")
+        if not (np.all(np.isfinite(starts)) and np.all(np.isfinite(rates))):
+            raise ValueError(f"starts and rates must be finite numbers, got {starts.tolist()} and {rates.tolist()}")
+        if starts[0] != 0 or np.any(np.diff(starts) <= 0):
+            raise ValueError(f"starts must begin at 0 and be strictly increasing, got {starts.tolist()}")
+        if np.any(rates < 0):
+            raise ValueError("rates must be >= 0")
+        object.__setattr__(self, "starts", starts)
+        object.__setattr__(self, "rates", rates)
+        object.__setattr__(self, "cumulative", np.concatenate(([0.0], np.cumsum(rates[:-1] * np.diff(starts)))))
+
+    @classmethod
+    def from_mapping(cls, tiers: Mapping) -> "Tiers":
+        """Adapter for `{start: rate}` dicts (string keys, as in JSON, are accepted)."""
+        if isinstance(tiers, Tiers):
+            return tiers
+        items = sorted((float(start), rate) for start, rate in tiers.items())
+        return cls(np.array([s for s, _ in items]), np.array([r for _, r in items]))
+
+    def to_dict(self) -> dict:
+        return {_number(s): _number(r) for s, r in zip(self.starts, self.rates)}
+
+    def __eq__(self, other):
+        if isinstance(other, Mapping):
+            try:
+                other = Tiers.from_mapping(other)
+            except (ValueError, TypeError):   # not a valid schedule
+                return False
+        if not isinstance(other, Tiers):
+            return NotImplemented
+        return np.array_equal(self.starts, other.starts) and np.array_equal(self.rates, other.rates)
+
+    def __hash__(self):
+        return hash((self.starts.tobytes(), self.rates.tobytes()))
+
+    def _tier(self, quantity):
+        # index of the tier of every quantity; below 0 the first tier is extended
+        k = np.maximum(np.searchsorted(self.starts, _primal(quantity), side="right") - 1, 0)
+        return int(k) if np.ndim(k) == 0 else k
+
+    def total(self, quantity):
+        """Σ of the rates of the first `quantity` units: a number, an array or a Dual."""
+        k = self._tier(quantity)
+        if isinstance(k, int):
+            return float(self.cumulative[k]) + float(self.rates[k]) * (quantity - float(self.starts[k]))
+        return self.cumulative[k] + self.rates[k] * (quantity - self.starts[k])
+
+    def rate(self, quantity):
+        """Rate of the next unit (the derivative of `total`, from the right at a threshold)."""
+        k = self._tier(quantity)
+        return float(self.rates[k]) if isinstance(k, int) else self.rates[k]
+
+
+def tiered(tiers: Tiers | None, quantity):
+    """`tiers.total(quantity)`, or `quantity` itself when there are no tiers (flat price)."""
+    return quantity if tiers is None else tiers.total(quantity)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from src.batch import OUTPUTS, evaluate_batch
+from src.benchmarks import sample_event
+from src.schedule import RoundCounts
+
+TIERS = dict(
+    participation_medal_tiers={0: 1.0, 100: 0.9, 300: 0.8},
+    gadget_tiers={0: 1.0, 250: 0.85},
+    cup_tiers={0: 1.0, 30: 0.9},
+    sponsorship_tiers={0: 0.0, 150: 0.5, 300: 1.0},
+)
+ROUNDS = ("turno1", "turno2", "turno3")
+SCENARIOS = dict(
+    participants=np.array([2, 80, 150, 205, 260, 450]),
+    participation_price=np.array([0.0, 8.0, 10.0, 12.5, 10.0, 15.0]),
+    categories=np.array([0, 5, 11, 11, 14, 20]),
+    available_coaches=np.array([0, 10, 13, 13, 12, 20]),
+    photos_per_atlete=np.array([0.0, 0.3, 0.55, 0.55, 0.8, 1.0]),
+    coaches_for_round=RoundCounts(ROUNDS, np.array([[0, 0, 0], [10, 9, 8], [12, 12, 11], [12, 0, 13], [14, 14, 14], [20, 18, 19]])),
+)
+
+
+def _scalar(i: int, **changes):
+    """Scenario `i` as a single event, with plain numbers and dicts (like the app's JSON)."""
+    values = {k: v[i].item() for k, v in SCENARIOS.items() if not isinstance(v, RoundCounts)}
+    coaches = SCENARIOS["coaches_for_round"]
+    counts = dict(zip(ROUNDS, coaches.counts[i].tolist()))
+    if coaches.salaries is not None:
+        counts = {"counts": counts, "salaries": dict(zip(ROUNDS, coaches.salaries.tolist()))}
+    return sample_event(coaches_for_round=counts, judges_for_round={"turno2": 1, "turno3": 2}, **changes, **values)
+
+
+@pytest.mark.parametrize("changes", [{}, TIERS], ids=["flat", "tiers"])
+@pytest.mark.parametrize("salaries", [None, np.array([8.0, 9.5, 12.0])], ids=["role", "per-round"])
+def test_batch_matches_the_scalar_model(changes, salaries, monkeypatch):
+    coaches = SCENARIOS["coaches_for_round"]
+    monkeypatch.setitem(SCENARIOS, "coaches_for_round", RoundCounts(ROUNDS, coaches.counts, salaries))
+    base = _scalar(0, **changes)
+    results = evaluate_batch(base, **SCENARIOS)
+    assert set(results) == set(OUTPUTS)
+    for i in range(len(SCENARIOS["participants"])):
+        expected = _scalar(i, **changes).evaluate(OUTPUTS)
+        for name in OUTPUTS:
+            np.testing.assert_allclose(results[name][i], expected[name], err_msg=f"{name}, scenario {i}")
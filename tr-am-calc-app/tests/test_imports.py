@@ -0,0 +1,6 @@
+from src.benchmarks import IMPORT_BUDGETS, check_imports
+
+
+def test_import_budgets():
+    # every module in its own fresh interpreter: under budget and without its forbidden packages
+    assert check_imports(IMPORT_BUDGETS) == []
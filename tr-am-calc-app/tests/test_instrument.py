@@ -0,0 +1,46 @@
+import threading
+import tracemalloc
+
+from src.instrument import profile, profiler
+
+
+def test_overlapping_sessions_disable_the_profiler_when_the_last_exits():
+    a, b = profile(memory=True), profile(memory=True)
+    session_a = a.__enter__()
+    session_b = b.__enter__()
+    with profiler.stage("shared"):
+        pass
+    a.__exit__(None, None, None)   # A exits first: B is still open
+    assert profiler.enabled and tracemalloc.is_tracing()
+    b.__exit__(None, None, None)
+    assert not profiler.enabled
+    assert not tracemalloc.is_tracing()
+    # the stage ran in B, the innermost block of this thread
+    assert [r["stage"] for r in session_b.records()] == ["shared"]
+    assert session_a.records() == []
+
+
+def test_sessions_only_see_the_stages_of_their_thread():
+    started, done = threading.Event(), threading.Event()
+    other = {}
+
+    def run():
+        with profile() as session:
+            with profiler.stage("other"):
+                pass
+            started.set()
+            done.wait()
+        other["records"] = session.records()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    started.wait()
+    with profile() as session:
+        session.reset()   # clears this session only
+        with profiler.stage("mine"):
+            pass
+    done.set()
+    thread.join()
+    assert [r["stage"] for r in session.records()] == ["mine"]
+    assert [r["stage"] for r in other["records"]] == ["other"]
+    assert not profiler.enabled
@@ -0,0 +1,14 @@
+from src.benchmarks import sample_event
+from src.optimizer import PlanConstraints, optimize_plan
+
+
+def test_default_minimum_keeps_the_base_schedule():
+    evento = sample_event()
+    plan = optimize_plan(evento, PlanConstraints(max_price=15))
+    assert plan.evento.coaches_for_round == evento.coaches_for_round
+
+
+def test_explicit_minimum_per_round():
+    evento = sample_event()
+    plan = optimize_plan(evento, PlanConstraints(max_price=15, min_coaches_for_round={"turno1": 10, "turno6": 2}))
+    assert plan.evento.coaches_for_round == dict(evento.coaches_for_round) | {"turno1": 10, "turno6": 2}
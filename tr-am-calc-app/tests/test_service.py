@@ -0,0 +1,8 @@
+from src.model import TrofeoAmicizia
+from src.recital import Recital
+from src.service import kpis
+
+
+def test_kpis_are_outputs_not_intermediate_costs():
+    assert "tot_coaches_cost" not in kpis(Recital)
+    assert {"break_even_participants", "profit_margin_pct", "dprofit_dparticipants"} <= set(kpis(TrofeoAmicizia))
@@ -0,0 +1,18 @@
+import numpy as np
+
+from src.benchmarks import sample_event
+from src.solver import required_value
+
+
+def test_int_fields_give_ints():
+    evento = sample_event()
+    needed = required_value(evento, "participants")
+    assert type(needed) is int and needed == evento.break_even_participants()
+    assert isinstance(required_value(evento, "participation_price"), float)
+
+
+def test_batch_matches_the_single_events():
+    prices = np.array([6.0, 10.0, 14.0])
+    batch = type(sample_event()).from_base(sample_event(), participation_price=prices)
+    needed = required_value(batch, "participants")
+    assert needed.tolist() == [required_value(sample_event(participation_price=p), "participants") for p in prices]
@@ -0,0 +1,46 @@
+import threading
+
+import numpy as np
+
+from src.benchmarks import sample_event
+from src.schedule import RoundCounts
+from src.store import ScenarioStore
+
+
+def test_round_salaries_survive_the_store():
+    coaches = RoundCounts(("turno1", "turno2"), (12, 11), (8.0, 12.5))
+    evento = sample_event(coaches_for_round=coaches, judges_for_round={"turno1": 1, "turno2": 0})
+    store = ScenarioStore()
+    saved = store.get(store.add(evento))
+    assert saved.coaches_for_round == coaches
+    assert saved.profit == evento.profit
+    assert store.diff(store.add(evento), store.add(sample_event())) != {}
+
+
+def test_round_dicts_round_trip():
+    coaches = RoundCounts(("turno1", "turno2"), np.array([[12, 11], [10, 9]]), np.array([8.0, 12.5]))
+    assert RoundCounts.from_mapping(coaches.to_dict()) == coaches
+    single = RoundCounts.from_mapping({"turno1": 12, "turno2": 11})
+    assert single.to_dict() == {"turno1": 12, "turno2": 11}
+    assert single == RoundCounts(("turno2", "turno1"), np.array([11, 12]))
+    assert hash(single) == hash(RoundCounts(("turno1", "turno2"), np.array([12, 11])))
+
+
+def test_concurrent_writers_get_distinct_ids(tmp_path):
+    path = str(tmp_path / "scenari.db")
+    ScenarioStore(path).close()   # the schema, once
+    evento, ids = sample_event(), []
+
+    def write():
+        store = ScenarioStore(path)
+        for _ in range(20):
+            ids.append(store.add(evento, tags=["bench"]))
+        store.close()
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(ids) == list(range(1, 81))
+    assert len(ScenarioStore(path).find(tag="bench")) == 80
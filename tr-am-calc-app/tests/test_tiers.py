@@ -0,0 +1,18 @@
+import math
+
+import pytest
+
+from src.tiers import Tiers
+
+
+def test_compares_unequal_to_invalid_mappings():
+    tiers = Tiers.from_mapping({"0": 1.0})
+    assert tiers == {0: 1}
+    assert tiers != {"x": 1}
+    assert tiers != {}
+
+
+@pytest.mark.parametrize("mapping", [{0: 1.0, 100: None}, {0: 1.0, math.inf: 0.5}, {0: math.nan}])
+def test_rejects_non_finite_values(mapping):
+    with pytest.raises(ValueError, match="finite"):
+        Tiers.from_mapping(mapping)